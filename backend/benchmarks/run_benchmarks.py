@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.synthetic import build_synthetic_artifacts
+
+# Example request for every route in main.py: name -> (method, path, JSON body)
+HOURLY_AQI_BODY = {
+    "hours_ahead": 24, "mean_temp": 25.0, "precipitation": 0.0, "wspd": 5.0, "wdir": 180.0,
+    "pressure": 1013.0, "roadside_nitrogen_dioxide": 30.0, "roadside_ozone": 40.0,
+    "roadside_pm10_particulate": 15.0, "roadside_pm2_5_particulate": 10.0,
+    "background_nitrogen_dioxide": 20.0, "background_ozone": 30.0,
+    "background_pm10_particulate": 15.0, "background_pm2_5_particulate": 10.0,
+}
+HEALTH_REPORT_BODY = {
+    "firstName": "Bench", "lastName": "Mark", "age": 30, "weight": 70.0, "height": 175.0,
+    "gender": "Other", "contactNumber": "0000000000", "email": "bench@example.com",
+    "conditions": ["Asthma"], "symptoms": [], "medications": [], "smokingStatus": "Never",
+}
+ROUTES = {
+    "predict_aqi_temperature": ("POST", "/api/predict_aqi_temperature", {}),
+    "predict_hourly_aqi": ("POST", "/api/predict_hourly_aqi/", HOURLY_AQI_BODY),
+    "predict_weekly_temperature": ("POST", "/api/predict_weekly_temperature/", {"days_ahead": 7}),
+    "predict_weekly_aqi": ("POST", "/api/predict_weekly_aqi/", {"days_ahead": 7}),
+    "predict_batch_health": ("POST", "/api/predict_batch", {"model": "health", "rows": [[25.0] * 10] * 32}),
+    "predict_batch_weather": ("POST", "/api/predict_batch", {"model": "weather", "rows": [[25.0] * 13] * 32}),
+    "air_quality_trends": ("GET", "/api/air_quality_trends", None),
+    "stations_nearest": ("GET", "/api/stations/nearest?lat=51.5&lon=-0.12&k=3", None),
+    "predict_grid": ("GET", "/api/predict_grid?bbox=-0.6,51.3,0.3,51.7&zoom=14", None),
+    "health_report": ("POST", "/api/healthReport", HEALTH_REPORT_BODY),
+    "contact": ("POST", "/api/contact", {"email": "bench@example.com", "message": "benchmark"}),
+    # After the submission routes, so the listings page through the rows they stored
+    "health_reports": ("GET", "/api/healthReports?limit=50", None),
+    "contact_messages": ("GET", "/api/contact/messages?limit=50", None),
+    "stream_aqi_temperature": ("GET", "/api/stream/aqi_temperature", None),
+    "models": ("GET", "/api/models", None),
+    "readyz": ("GET", "/readyz", None),
+    "metrics": ("GET", "/metrics", None),
+}
+# Left out on purpose:
+#   POST /api/models/{name}/rollback switches the served model, which would change what every later route measures
+#   /api/debug/profiler only exists with AQ_ENABLE_PROFILER=1 and just toggles or dumps the sampler
+#   /docs, /redoc and /openapi.json are FastAPI's generated documentation
+
+# Routes that answer with an endless event stream; they are timed from connecting to the first event
+STREAM_ROUTES = {"stream_aqi_temperature"}
+
+# Latency percentiles, throughput and error count for one set of timings
+def summarize(latencies, elapsed, errors=0):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    if len(latencies) == 0:
+        return {"count": 0, "errors": errors}
+    return {
+        "count": int(len(latencies)),
+        "errors": int(errors),
+        "mean_ms": float(latencies.mean() * 1000),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "rps": float(len(latencies) / elapsed) if elapsed > 0 else None,
+    }
+
+# Send n_requests to one route from `concurrency` concurrent clients
+# request() sends one request and returns its status code
+async def bench_route(request, n_requests, concurrency):
+    latencies = []
+    errors = 0
+    remaining = n_requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status_code = await request()
+            latencies.append(time.perf_counter() - start)
+            if status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+# Open an event stream through the ASGI interface, wait for its first event and disconnect
+# (httpx's ASGI transport only returns once the whole response body has been sent)
+async def first_stream_event(app, path, headers):
+    path, _, query = path.partition("?")
+    status = {}
+    first_event = asyncio.get_running_loop().create_future()
+    disconnect = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body" and not first_event.done():
+            if message.get("body") or not message.get("more_body", False):
+                first_event.set_result(status["code"])
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "server": ("benchmark", 80), "client": ("benchmark", 0), "root_path": "",
+             "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+             "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()]}
+    task = asyncio.ensure_future(app(scope, receive, send))
+    try:
+        return await first_event
+    finally:
+        disconnect.set()
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+# Drive every route in-process through the ASGI app, with the app lifespan running
+# The listing routes need the admin token, which main() sets before importing the app
+async def bench_routes(app, routes, concurrency_levels, n_requests, warmup):
+    import httpx
+
+    headers = {"X-Admin-Token": os.environ.get("AQ_ADMIN_TOKEN", "")}
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, (method, path, body) in routes.items():
+                if name in STREAM_ROUTES:
+                    request = functools.partial(first_stream_event, app, path, headers)
+                else:
+                    async def request(method=method, path=path, body=body):
+                        response = await client.request(method, path, json=body, headers=headers)
+                        return response.status_code
+                for _ in range(warmup):
+                    await request()
+                results[name] = {}
+                for concurrency in concurrency_levels:
+                    results[name][str(concurrency)] = await bench_route(request, n_requests, concurrency)
+                    print(f"{name:28s} c={concurrency:<4d} {format_summary(results[name][str(concurrency)])}")
+    return results
+
+# Time scaler.transform + model.predict for each batch size
+def bench_model(model, scaler, feature_matrix, batch_sizes, repeat, rng):
+    return bench_rows(lambda index: model.predict(scaler.transform(feature_matrix[index])),
+                      len(feature_matrix), batch_sizes, repeat, rng)
+
+# Time predict(index) for batches of random row indices
+def bench_rows(predict, n_rows, batch_sizes, repeat, rng):
+    results = {}
+    for batch_size in batch_sizes:
+        index = rng.integers(0, n_rows, size=batch_size)
+        predict(index)  # warm-up
+        latencies = []
+        start_all = time.perf_counter()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            predict(index)
+            latencies.append(time.perf_counter() - start)
+        summary = summarize(latencies, time.perf_counter() - start_all)
+        summary["rows_per_s"] = float(batch_size * repeat / sum(latencies)) if sum(latencies) > 0 else None
+        results[str(batch_size)] = summary
+    return results
+
+# Benchmarks the active model versions; health_sklearn is the uncompiled forest of the same version
+# health_table looks the rows up in the precomputed prediction table, health_lru serves them from
+# the LRU used for caller-supplied rows (warmed by the first call)
+def bench_models(main, batch_sizes, repeat):
+    import joblib
+
+    rng = np.random.default_rng(0)
+    main.load_state()
+    health = main.health_models.current
+    weather = main.weather_models.current
+    sklearn_health = joblib.load(os.path.join(health.path, "aq_health_regression.pkl"))
+    models = {
+        "health_sklearn": (sklearn_health, health.scaler, main.health_matrix.values),
+        "health_served": (health.model, health.scaler, main.health_matrix.values),
+        "weather": (weather.model, weather.scaler, main.weather_matrix.values),
+    }
+    results = {}
+    for name, (model, scaler, features) in models.items():
+        results[name] = bench_model(model, scaler, features, batch_sizes, repeat, rng)
+
+    def lookup_lru(index):
+        return main.predict_cached_rows("health", health.version, main.health_matrix.values[index])
+
+    n_rows = len(main.health_matrix)
+    results["health_table"] = bench_rows(lambda index: main.health_predictions.lookup(health.version, index, 1),
+                                         n_rows, batch_sizes, repeat, rng)
+    results["health_lru"] = bench_rows(lookup_lru, n_rows, batch_sizes, repeat, rng)
+    for name, by_batch_size in results.items():
+        for batch_size, summary in by_batch_size.items():
+            print(f"{name:28s} n={batch_size:<6s} {format_summary(summary)}")
+    return results
+
+# Serialize a {"values": n floats} payload with the encoding the routes used before
+# (a list of NumPy floats through jsonable_encoder, or tolist() into JSONResponse)
+# and with every encoder available in utils/response_encoding.py
+def bench_encodings(sizes, repeat):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from utils.response_encoding import ENCODERS, FORMAT_NAMES
+
+    rng = np.random.default_rng(0)
+    encoders = {
+        "jsonable_encoder": lambda payload: JSONResponse(content=jsonable_encoder(
+            {**payload, "values": list(payload["values"])})).body,
+        "json_tolist": lambda payload: JSONResponse(content={**payload, "values": payload["values"].tolist()}).body,
+    }
+    encoders.update({FORMAT_NAMES[media_type]: encoder for media_type, encoder in ENCODERS.items()})
+
+    results = {}
+    for size in sizes:
+        payload = {"values": np.round(rng.normal(50, 15, size), 2), "model_versions": {"health": "base"}}
+        results[str(size)] = {}
+        for name, encoder in encoders.items():
+            body = encoder(payload)  # warm-up
+            latencies = []
+            start_all = time.perf_counter()
+            for _ in range(repeat):
+                start = time.perf_counter()
+                encoder(payload)
+                latencies.append(time.perf_counter() - start)
+            summary = summarize(latencies, time.perf_counter() - start_all)
+            summary["bytes"] = len(body)
+            results[str(size)][name] = summary
+            print(f"{name:28s} n={size:<8d} p50={summary['p50_ms']:.3f}ms bytes={len(body)}")
+    return results
+
+# Worker for bench_memory: load the app, touch the models and feature matrices like
+# serving would, report this process's memory and stay alive until stdin is closed
+MEMORY_WORKER = """
+import json, sys
+import main
+main.load_state()
+main.predict_health(main.health_models.current.version, main.health_matrix.values)
+main.predict_weather(main.weather_models.current.version, main.weather_matrix.values)
+shared_bytes = main.shared_artifacts.nbytes if main.shared_artifacts is not None else 0
+print(json.dumps({"memory": main.process_memory(), "shared_artifact_bytes": shared_bytes}), flush=True)
+sys.stdin.read()
+"""
+
+# Run `workers` app processes side by side, once with private copies of the model and
+# feature arrays (AQ_SHARED_DIR="") and once mapping them from a shared artifact cache,
+# and report their mean memory; pss counts shared pages once across the workers
+def bench_memory(workers):
+    results = {}
+    for mode, shared_dir in (("private", ""), ("shared", tempfile.mkdtemp(prefix="aq_shared_"))):
+        env = {**os.environ, "AQ_SHARED_DIR": shared_dir}
+        processes = [subprocess.Popen([sys.executable, "-W", "ignore", "-c", MEMORY_WORKER], cwd=BACKEND_DIR, env=env,
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                     for _ in range(workers)]
+        # Measure only once every worker is loaded, so the shared pages are counted across all of them
+        reports = [json.loads(process.stdout.readline()) for process in processes]
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+        summary = {f"{kind}_mb": float(np.mean([report["memory"].get(kind, 0) for report in reports]) / 2**20)
+                   for kind in ("rss", "pss", "shared", "private")}
+        summary["shared_artifact_mb"] = reports[0]["shared_artifact_bytes"] / 2**20
+        results[mode] = summary
+        print(f"{mode:8s} workers={workers} " + " ".join(f"{key}={value:.2f}" for key, value in summary.items()))
+
+    results["pss_saved_per_worker_mb"] = results["private"]["pss_mb"] - results["shared"]["pss_mb"]
+    print(f"PSS saved per worker: {results['pss_saved_per_worker_mb']:.2f} MB")
+    return results
+
+def format_summary(summary):
+    if summary.get("count", 0) == 0:
+        return "no samples"
+    rps = f"{summary['rps']:.1f}" if summary.get("rps") is not None else "-"
+    return (f"p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms "
+            f"p99={summary['p99_ms']:.2f}ms rps={rps} errors={summary.get('errors', 0)}")
+
+def environment_info():
+    import sklearn
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+# Flatten nested results into {"section/name/level/metric": value}
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+# Report latency metrics that got worse by more than threshold (e.g. 0.1 = 10%)
+def compare(baseline_path, candidate_path, threshold):
+    with open(baseline_path) as f:
+        baseline = flatten({k: v for k, v in json.load(f).items() if k in ("routes", "models", "encodings")})
+    with open(candidate_path) as f:
+        candidate = flatten({k: v for k, v in json.load(f).items() if k in ("routes", "models", "encodings")})
+
+    regressions = []
+    for key, old in sorted(baseline.items()):
+        if not key.endswith("_ms") or key not in candidate or old <= 0:
+            continue
+        change = (candidate[key] - old) / old
+        marker = "REGRESSION" if change > threshold else ""
+        print(f"{key:70s} {old:10.3f} -> {candidate[key]:10.3f} ({change:+.1%}) {marker}")
+        if change > threshold:
+            regressions.append(key)
+
+    print(f"{len(regressions)} regression(s) above {threshold:.0%}")
+    return regressions
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FastAPI routes and models in backend/main.py")
+    parser.add_argument("--synthetic", action="store_true", help="use generated data and models instead of the real artifacts")
+    parser.add_argument("--synthetic-rows", type=int, default=240, help="rows in each synthetic dataset")
+    parser.add_argument("--models-dir", default=os.path.join(BACKEND_DIR, "models"))
+    parser.add_argument("--data-dir", default=os.path.join(BACKEND_DIR, "data"))
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated route names to run")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--batch-sizes", type=parse_int_list, default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20, help="predict calls per batch size")
+    parser.add_argument("--encoding-sizes", type=parse_int_list, default=[24, 10000, 1000000],
+                        help="values per payload in the response encoding benchmark")
+    parser.add_argument("--encoding-repeat", type=int, default=5, help="encodes per payload size and format")
+    parser.add_argument("--memory-workers", type=int, default=0,
+                        help="compare the memory of this many app processes with and without shared artifacts")
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--skip-models", action="store_true")
+    parser.add_argument("--skip-encodings", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="diff two result files and exit")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    if args.synthetic:
+        workdir = tempfile.mkdtemp(prefix="aq_bench_")
+        args.models_dir = os.path.join(workdir, "models")
+        args.data_dir = os.path.join(workdir, "data")
+        build_synthetic_artifacts(args.data_dir, args.models_dir, n_rows=args.synthetic_rows)
+
+    # main.py reads its artifact locations at import time
+    os.environ["AQ_MODELS_DIR"] = args.models_dir
+    os.environ["AQ_DATA_DIR"] = args.data_dir
+    # The map routes need a station file: the synthetic one, or the sample sites of the real data
+    os.environ.setdefault("AQ_STATIONS_FILE", "stations.csv" if args.synthetic else "sample_stations.csv")
+    # The submissions posted by the health_report and contact routes go to a throwaway database
+    db_dir = tempfile.mkdtemp(prefix="aq_bench_db_")
+    os.environ["AQ_DB_PATH"] = os.path.join(db_dir, "submissions.db")
+    # The submission listing routes only answer with an admin token
+    os.environ.setdefault("AQ_ADMIN_TOKEN", "benchmark")
+    import main as service
+
+    results = {
+        "environment": environment_info(),
+        "config": {key: value for key, value in vars(args).items() if key != "compare"},
+    }
+    if not args.skip_routes:
+        routes = {name: ROUTES[name] for name in args.routes.split(",") if name in ROUTES}
+        results["routes"] = asyncio.run(bench_routes(service.app, routes, args.concurrency, args.requests, args.warmup))
+    if not args.skip_models:
+        results["models"] = bench_models(service, args.batch_sizes, args.repeat)
+    if args.memory_workers > 0:
+        results["memory"] = bench_memory(args.memory_workers)
+    if not args.skip_encodings:
+        results["encodings"] = bench_encodings(args.encoding_sizes, args.encoding_repeat)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    shutil.rmtree(db_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
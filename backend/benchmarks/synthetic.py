@@ -0,0 +1,92 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.preprocessing import StandardScaler
+
+# Synthetic stand-ins for the datasets and models, so benchmarks run offline
+# Columns, file names and model types match what backend/main.py loads
+
+HEALTH_FEATURES = [
+    'London Mean Roadside:Nitrogen Dioxide (ug/m3)',
+    'London Mean Roadside:PM10 Particulate (ug/m3)',
+    'London Mean Roadside:PM2.5 Particulate (ug/m3)',
+    'London Mean Roadside:Ozone (ug/m3)',
+    'London Mean Roadside:Sulphur Dioxide (ug/m3)',
+    'London Mean Background:Nitrogen Dioxide (ug/m3)',
+    'London Mean Background:Ozone (ug/m3)',
+    'London Mean Background:PM10 Particulate (ug/m3)',
+    'London Mean Background:PM2.5 Particulate (ug/m3)',
+    'London Mean Background:Sulphur Dioxide (ug/m3)'
+]
+HEALTH_TARGETS = ['All respiratory deaths', 'Bronchiectasis', 'COPD']
+
+WEATHER_FEATURES = [
+    'mean_temp', 'wspd', 'wdir', 'precipitation', 'pressure',
+    'Roadside_Nitrogen_Dioxide (ug/m3)', 'Roadside_Ozone (ug/m3)',
+    'Roadside_PM10_Particulate (ug/m3)', 'Roadside_PM2.5_Particulate (ug/m3)',
+    'Background_Nitrogen_Dioxide (ug/m3)', 'Background_Ozone (ug/m3)',
+    'Background_PM10_Particulate (ug/m3)', 'Background_PM2.5_Particulate (ug/m3)'
+]
+WEATHER_TARGETS = ['Roadside_PM2.5_Particulate (ug/m3)', 'Background_Nitrogen_Dioxide (ug/m3)', 'Roadside_Ozone (ug/m3)']
+WEATHER_EXTRA_COLUMNS = ['Roadside_Sulphur_Dioxide (ug/m3)', 'Background_Sulphur_Dioxide (ug/m3)']
+
+# Rough (mean, standard deviation) of each column in the real data
+COLUMN_SCALES = {
+    'mean_temp': (11.5, 5.5), 'wspd': (15.0, 3.0), 'wdir': (200.0, 40.0),
+    'precipitation': (1.7, 0.8), 'pressure': (101600.0, 500.0),
+    'All respiratory deaths': (5500.0, 1200.0), 'Bronchiectasis': (130.0, 25.0), 'COPD': (2200.0, 450.0),
+}
+DEFAULT_SCALE = (25.0, 8.0)
+
+def _monthly_dates(n_rows, start_year=2008):
+    return [f"{start_year + i // 12}-{i % 12 + 1:02d}" for i in range(n_rows)]
+
+def _random_columns(columns, n_rows, rng):
+    data = {}
+    for column in columns:
+        mean, std = COLUMN_SCALES.get(column, DEFAULT_SCALE)
+        data[column] = np.abs(rng.normal(mean, std, n_rows)).round(1)
+    return data
+
+# Monitoring sites scattered around central London with random readings
+def _random_stations(n_stations, rng):
+    stations = pd.DataFrame({
+        'name': [f"Station {i + 1}" for i in range(n_stations)],
+        'site': rng.choice(['roadside', 'background'], n_stations),
+        'latitude': rng.uniform(51.35, 51.65, n_stations).round(4),
+        'longitude': rng.uniform(-0.45, 0.25, n_stations).round(4),
+    })
+    return stations.assign(**_random_columns(HEALTH_FEATURES, n_stations, rng))
+
+# Write synthetic CSVs and trained models to data_dir / models_dir
+def build_synthetic_artifacts(data_dir, models_dir, n_rows=240, n_estimators=50, seed=42, n_stations=12):
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(models_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    health = pd.DataFrame({'date': _monthly_dates(n_rows, 2015), **_random_columns(HEALTH_FEATURES + HEALTH_TARGETS, n_rows, rng)})
+    weather_columns = WEATHER_FEATURES + WEATHER_EXTRA_COLUMNS
+    weather = pd.DataFrame({'date': _monthly_dates(n_rows), **_random_columns(weather_columns, n_rows, rng)})
+
+    health.to_csv(os.path.join(data_dir, 'aqhealth_merged_cleaned.csv'), index=False)
+    weather.to_csv(os.path.join(data_dir, 'merged_weather_air_quality_cleaned_renamed.csv'), index=False)
+    _random_stations(n_stations, rng).to_csv(os.path.join(data_dir, 'stations.csv'), index=False)
+
+    # Same model types as the shipped models in backend/models
+    scaler_health = StandardScaler().fit(health[HEALTH_FEATURES])
+    health_model = MultiOutputRegressor(RandomForestRegressor(n_estimators=n_estimators, random_state=seed))
+    health_model.fit(scaler_health.transform(health[HEALTH_FEATURES]), health[HEALTH_TARGETS])
+
+    scaler_weather = StandardScaler().fit(weather[WEATHER_FEATURES])
+    weather_model = MultiOutputRegressor(Ridge(alpha=1.0))
+    weather_model.fit(scaler_weather.transform(weather[WEATHER_FEATURES]), weather[WEATHER_TARGETS])
+
+    joblib.dump(health_model, os.path.join(models_dir, 'aq_health_regression.pkl'))
+    joblib.dump(weather_model, os.path.join(models_dir, 'aq_weather_regression.pkl'))
+    joblib.dump(scaler_health, os.path.join(models_dir, 'scaler_health.pkl'))
+    joblib.dump(scaler_weather, os.path.join(models_dir, 'scaler_weather.pkl'))
@@ -0,0 +1,29 @@
+import os
+
+# Service configuration, read from AQ_* environment variables when the app is imported
+# Paths default to the folders next to this file, so the backend runs from any checkout
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Model versions (see utils/model_registry.py) and the datasets
+MODELS_DIR = os.environ.get("AQ_MODELS_DIR", os.path.join(BACKEND_DIR, "models"))
+DATA_DIR = os.environ.get("AQ_DATA_DIR", os.path.join(BACKEND_DIR, "data"))
+
+# Prebuilt artifact bundle (python main.py --build-artifacts), memory-mapped by every worker
+# Set AQ_SHARED_DIR="" to load from the CSVs and pickles in each process instead
+SHARED_DIR = os.environ.get("AQ_SHARED_DIR", os.path.join(DATA_DIR, "shared"))
+
+# SQLite database for health reports and contact messages
+DB_PATH = os.environ.get("AQ_DB_PATH", os.path.join(DATA_DIR, "submissions.db"))
+
+# Files inside DATA_DIR
+HEALTH_DATASET = "aqhealth_merged_cleaned.csv"
+WEATHER_DATASET = "merged_weather_air_quality_cleaned_renamed.csv"
+
+# Per-site readings (name, latitude, longitude and feature columns) behind /api/stations/nearest and
+# /api/predict_grid. The repo has no measured per-site data, so the map endpoints are disabled unless
+# AQ_STATIONS_FILE names a file in DATA_DIR. SAMPLE_STATIONS_FILE holds approximate London sites with
+# readings made up from the London means; it is only meant for trying the map out, and the endpoints
+# mark their responses as sample data when it is used.
+STATIONS_FILE = os.environ.get("AQ_STATIONS_FILE", "")
+SAMPLE_STATIONS_FILE = "sample_stations.csv"
@@ -1,12 +1,70 @@
-import joblib
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 import numpy as np
 import logging
+import os
+import asyncio
+import json
+import time
 
-app = FastAPI()
+from config import (DATA_DIR, DB_PATH, HEALTH_DATASET, MODELS_DIR, SAMPLE_STATIONS_FILE, SHARED_DIR, STATIONS_FILE,
+                    WEATHER_DATASET)
+from utils.array_models import ArrayScaler, LinearModel
+from utils.batch_inference import predict_batch, predict_scaled
+from utils.broadcaster import Broadcaster
+from utils.column_store import ColumnStore, store_is_current, store_path_for
+from utils.feature_store import FeatureMatrix, check_manifest
+from utils.forecast_engine import ForecastEngine, step_fraction_for, summarize_scenarios
+from utils.inference_executor import InferenceExecutor, InferenceUnavailable
+from utils.metrics import MetricsRegistry
+from utils.micro_batcher import MicroBatcher
+from utils.model_registry import ModelRegistry
+from utils.prediction_cache import PredictionCache, PredictionTable
+from utils.profiler import SamplingProfiler
+from utils.response_encoding import ENCODERS, FORMAT_NAMES, EncodingError, encode, negotiate
+from utils.shared_artifacts import ArtifactCache, process_memory
+from utils.snapshot import Snapshot, etag_matches
+from utils.station_index import StationIndex
+from utils.submission_store import SubmissionStore, WriteBehindQueue, WriteQueueFull
+from utils.tile_grid import TileCache, tile_centers, tiles_for_bbox
+from utils.trends_cube import TrendsCube
+from utils.tree_engine import CompiledForest
+
+# Debug output goes through logging; set AQ_LOG_LEVEL=DEBUG to see it
+logging.basicConfig(level=os.environ.get("AQ_LOG_LEVEL", "WARNING").upper())
+
+# Latency histograms and gauges exposed on /metrics
+metrics = MetricsRegistry()
+metrics.describe("endpoint_stage_duration_seconds", "Time spent in each stage of an endpoint")
+metrics.describe("model_stage_duration_seconds", "Time spent scaling and predicting per model")
+metrics.describe("request_duration_seconds", "HTTP request latency by route")
+metrics.describe("stream_fanout_seconds", "Time from publishing a streamed update to handing it to each client")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the models and data before accepting requests; /readyz reports when this is done
+    load_state()
+    # Keep the navigation bar prediction fresh in the background
+    aqi_temperature_snapshot.start()
+    # Watch the models directory for new versions
+    health_models.start()
+    weather_models.start()
+    submission_store.open()
+    submission_writer.start()
+    yield
+    # Commit the submissions still queued before anything else stops
+    await submission_writer.close()
+    submission_store.close()
+    # Stop the background tasks and the inference workers when the server shuts down
+    await health_models.stop()
+    await weather_models.stop()
+    await aqi_temperature_snapshot.stop()
+    inference_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -17,106 +75,526 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load the regression models
-aq_health_model_data = joblib.load("C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//backend//models//aq_health_regression.pkl")
-aq_weather_model_data = joblib.load("C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//backend//models//aq_weather_regression.pkl")
-# Load scalers
-scaler_health = joblib.load("C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//backend//models//scaler_health.pkl")
-scaler_weather = joblib.load("C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//backend//models//scaler_weather.pkl")
+# Record the latency of every request, labelled by route template rather than raw path
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe("request_duration_seconds", time.perf_counter() - start, method=request.method,
+                    route=route.path if route is not None else "unmatched", status=str(response.status_code))
+    return response
+
+# Model and data directories and the other paths come from config.py (AQ_* environment variables)
+
+# Everything served is loaded from the artifact bundle in SHARED_DIR: the feature matrices, the
+# trends cube, the stations and every model version, stored as arrays and memory-mapped read-only.
+# All uvicorn workers (and process-mode inference workers) share one copy of them in the page cache,
+# and startup needs neither pandas nor sklearn. A missing or stale artifact is rebuilt from the CSVs
+# and pickles by the first process that needs it; python main.py --build-artifacts builds them ahead of time.
+shared_artifacts = ArtifactCache(SHARED_DIR) if SHARED_DIR else None
+
+metrics.gauge("process_memory_bytes", process_memory,
+              "Resident memory of this worker; rss - pss is what sharing pages with other processes saves",
+              label_name="kind")
+metrics.gauge("shared_artifact_bytes", lambda: dict(shared_artifacts.mapped) if shared_artifacts else {},
+              "Model and feature arrays this worker maps from the shared cache instead of copying",
+              label_name="artifact")
+
+# Load datasets for building the artifacts
+# They are memory-mapped from DATA_DIR/store/ once converted (python utils/column_store.py),
+# otherwise, or if the CSV has changed since the conversion, read from the CSV
+def load_dataset(csv_file):
+    csv_path = os.path.join(DATA_DIR, csv_file)
+    store_path = store_path_for(DATA_DIR, csv_file)
+    if store_is_current(store_path, csv_path):
+        return ColumnStore.open(store_path)
+    if os.path.exists(store_path):
+        logging.warning(f"Column store {store_path} is older than {csv_file}; reading the CSV instead.")
+    import pandas as pd
+
+    return ColumnStore.from_frame(pd.read_csv(csv_path))
+
+# Files an artifact built from a dataset depends on
+def dataset_sources(csv_file):
+    return [os.path.join(DATA_DIR, csv_file), os.path.join(store_path_for(DATA_DIR, csv_file), "manifest.json")]
+
+# Arrays and metadata of an artifact from the bundle; build() makes them when there is no bundle
+def load_artifact(name, sources, build, key=None):
+    if shared_artifacts is None:
+        return build()
+    return shared_artifacts.load(name, sources, build, key=key)
+
+# Feature order expected by the health model
+HEALTH_FEATURE_NAMES = [
+    'London Mean Roadside:Nitrogen Dioxide (ug/m3)',
+    'London Mean Roadside:PM10 Particulate (ug/m3)',
+    'London Mean Roadside:PM2.5 Particulate (ug/m3)',
+    'London Mean Roadside:Ozone (ug/m3)',
+    'London Mean Roadside:Sulphur Dioxide (ug/m3)',
+    'London Mean Background:Nitrogen Dioxide (ug/m3)',
+    'London Mean Background:Ozone (ug/m3)',
+    'London Mean Background:PM10 Particulate (ug/m3)',
+    'London Mean Background:PM2.5 Particulate (ug/m3)',
+    'London Mean Background:Sulphur Dioxide (ug/m3)'
+]
+
+# Feature order expected by the weather model (same order as in training)
+WEATHER_FEATURE_NAMES = [
+    'mean_temp',
+    'wspd',
+    'wdir',
+    'precipitation',
+    'pressure',
+    'Roadside_Nitrogen_Dioxide (ug/m3)',
+    'Roadside_Ozone (ug/m3)',
+    'Roadside_PM10_Particulate (ug/m3)',
+    'Roadside_PM2.5_Particulate (ug/m3)',
+    'Background_Nitrogen_Dioxide (ug/m3)',
+    'Background_Ozone (ug/m3)',
+    'Background_PM10_Particulate (ug/m3)',
+    'Background_PM2.5_Particulate (ug/m3)'
+]
+
+# Serving state, filled in by load_state() when the app starts
+health_matrix = None
+weather_matrix = None
+health_feature_medians = None
+health_forecast_engine = None
+trends_cube = None
+station_index = None
+
+# Convert each dataset once into a contiguous matrix in model feature order
+# The column manifests are checked against each model version's scaler when it is loaded
+# The metadata holds the step_fraction of the dataset's dates for forecasting
+def load_feature_matrix(name, csv_file, feature_names):
+    def build():
+        data = load_dataset(csv_file)
+        return ({"values": FeatureMatrix.from_store(data, feature_names).values},
+                {"step_fraction": step_fraction_for(data.dates)})
+
+    arrays, metadata = load_artifact(f"features/{name}", dataset_sources(csv_file), build, key=feature_names)
+    return FeatureMatrix(arrays["values"], feature_names), metadata
+
+# Aggregate the trends data once; a new cube (and empty cache) is built only when the data is reloaded
+def load_trends_cube():
+    arrays, metadata = load_artifact("trends", dataset_sources(WEATHER_DATASET),
+                                     lambda: TrendsCube.from_store(load_dataset(WEATHER_DATASET)).to_arrays())
+    return TrendsCube.from_saved(arrays, metadata)
+
+# Random rows are drawn by index; set AQ_RANDOM_SEED for reproducible draws
+random_seed = os.environ.get("AQ_RANDOM_SEED")
+rng = np.random.default_rng(int(random_seed) if random_seed is not None else None)
+
+# Upper bound on the number of rows accepted by /api/predict_batch
+MAX_BATCH_ROWS = 10000
+
+# Upper bound on the days predicted by the weekly endpoints
+MAX_DAYS_AHEAD = 366
+
+# Largest difference from sklearn accepted for the compiled health model
+COMPILED_MODEL_TOLERANCE = 1e-6
+
+# Dataset rows used for the warm-up prediction of every newly loaded model version
+WARMUP_ROWS = 32
+
+# Extract the health model from the loaded data and replace the forest with its
+# array-backed compiled form, but only if it reproduces sklearn's predictions on the dataset rows
+def prepare_health_model(model, scaler):
+    if isinstance(model, CompiledForest):
+        return model
+    model = model[0] if isinstance(model, tuple) else model
+    try:
+        compiled_model = CompiledForest.from_model(model)
+        check_features = scaler.transform(health_matrix.values)
+        deviation = compiled_model.max_deviation(model, check_features)
+        if deviation <= COMPILED_MODEL_TOLERANCE:
+            return compiled_model
+        logging.warning(f"Compiled health model deviates from sklearn by {deviation}; using sklearn model.")
+    except TypeError as e:
+        logging.warning(f"Health model could not be compiled: {str(e)}")
+    return model
+
+# Replace the linear weather model with its coefficient arrays
+def prepare_weather_model(model, scaler):
+    model = model.get("model") if isinstance(model, dict) else model
+    if isinstance(model, LinearModel):
+        return model
+    try:
+        return LinearModel.from_model(model)
+    except TypeError as e:
+        logging.warning(f"Weather model could not be converted: {str(e)}")
+    return model
+
+# Served model types and their names in the bundle
+MODEL_KINDS = {"forest": CompiledForest, "linear": LinearModel}
+
+# Every model version is stored in the bundle as arrays: its scaler plus the prepared model
+# Only the first process unpickles and prepares a version; the others map its arrays without
+# importing sklearn. A model that can't be stored as arrays is unpickled by every process as before.
+# Unpickled StandardScalers are replaced by their array form, which transforms the same way but
+# without sklearn's "X does not have valid feature names" warning on every NumPy input.
+def make_model_loader(name, model_file, scaler_file, prepare):
+    def unpickle(path):
+        import joblib
+
+        scaler = joblib.load(os.path.join(path, scaler_file))
+        try:
+            scaler = ArrayScaler.from_scaler(scaler)
+        except TypeError:
+            pass
+        return joblib.load(os.path.join(path, model_file)), scaler
+
+    def loader(version, path):
+        if shared_artifacts is None:
+            return unpickle(path)
+
+        def build():
+            model, scaler = unpickle(path)
+            model = prepare(model, scaler)
+            kind = next((kind for kind, cls in MODEL_KINDS.items() if isinstance(model, cls)), None)
+            try:
+                scaler_arrays, scaler_metadata = ArrayScaler.from_scaler(scaler).to_arrays()
+            except TypeError:
+                kind = None
+            if kind is None:
+                return {}, {"kind": None}
+            model_arrays, model_metadata = model.to_arrays()
+            arrays = {**{f"model.{key}": value for key, value in model_arrays.items()},
+                      **{f"scaler.{key}": value for key, value in scaler_arrays.items()}}
+            return arrays, {"kind": kind, "model": model_metadata, "scaler": scaler_metadata}
+
+        sources = [os.path.join(path, model_file), os.path.join(path, scaler_file)]
+        arrays, metadata = shared_artifacts.load(f"models/{name}/{version}", sources, build)
+        if metadata["kind"] is None:
+            return unpickle(path)
+        model = MODEL_KINDS[metadata["kind"]].from_arrays(_with_prefix(arrays, "model."), metadata["model"])
+        scaler = ArrayScaler.from_arrays(_with_prefix(arrays, "scaler."), metadata["scaler"])
+        return model, scaler
+    return loader
+
+def _with_prefix(arrays, prefix):
+    return {key[len(prefix):]: value for key, value in arrays.items() if key.startswith(prefix)}
 
-# Extract the models from the loaded data
-aq_health_model = aq_health_model_data[0] if isinstance(aq_health_model_data, tuple) else aq_health_model_data
-aq_weather_model = aq_weather_model_data.get("model") if isinstance(aq_weather_model_data, dict) else aq_weather_model_data
+# Reject a model version whose scaler does not match the feature manifest
+# or whose warm-up prediction is not finite or lacks the outputs the endpoints use
+# get_feature_matrix() returns the matrix loaded at startup
+def make_validator(feature_names, get_feature_matrix, n_outputs):
+    def validate(bundle):
+        check_manifest(feature_names, bundle.scaler)
+        predictions = predict_batch(bundle.model, bundle.scaler, get_feature_matrix().values[:WARMUP_ROWS])
+        if predictions.shape[1] < n_outputs:
+            raise ValueError(f"Model returns {predictions.shape[1]} outputs, expected at least {n_outputs}")
+        if not np.all(np.isfinite(predictions)):
+            raise ValueError("Model returned non-finite warm-up predictions")
+    return validate
 
-# Load datasets for feature extraction
-data_health = pd.read_csv("C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//backend//data//aqhealth_merged_cleaned.csv")
-data_weather = pd.read_csv("C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//backend//data//merged_weather_air_quality_cleaned_renamed.csv")
+# Versioned models: files directly in MODELS_DIR are version "base", MODELS_DIR/<version>/ hold newer ones
+# The newest valid version is served; AQ_MODEL_POLL_INTERVAL seconds between checks (0 disables the watcher)
+model_poll_interval = float(os.environ.get("AQ_MODEL_POLL_INTERVAL", 30))
+health_models = ModelRegistry("health", MODELS_DIR, "aq_health_regression.pkl", "scaler_health.pkl",
+                              prepare=prepare_health_model,
+                              validate=make_validator(HEALTH_FEATURE_NAMES, lambda: health_matrix, 2),
+                              poll_interval=model_poll_interval,
+                              loader=make_model_loader("health", "aq_health_regression.pkl", "scaler_health.pkl",
+                                                       prepare_health_model))
+weather_models = ModelRegistry("weather", MODELS_DIR, "aq_weather_regression.pkl", "scaler_weather.pkl",
+                               prepare=prepare_weather_model,
+                               validate=make_validator(WEATHER_FEATURE_NAMES, lambda: weather_matrix, 1),
+                               poll_interval=model_poll_interval,
+                               loader=make_model_loader("weather", "aq_weather_regression.pkl", "scaler_weather.pkl",
+                                                        prepare_weather_model))
+model_registries = {"health": health_models, "weather": weather_models}
+
+# Model inference runs on a separate thread or process pool so it never blocks the event loop
+# AQ_INFERENCE_MODE is "thread" or "process"; QUEUE is how many jobs may wait beyond the busy workers
+inference_executor = InferenceExecutor(
+    mode=os.environ.get("AQ_INFERENCE_MODE", "thread"),
+    max_workers=int(os.environ.get("AQ_INFERENCE_WORKERS", min(os.cpu_count() or 1, 4))),
+    max_queue=int(os.environ.get("AQ_INFERENCE_QUEUE", 64)),
+    timeout=float(os.environ.get("AQ_INFERENCE_TIMEOUT", 10.0)),
+)
+
+# Model calls submitted to the executor
+# They are module-level functions so they can also be pickled in process mode
+# (in process mode their scale/predict timings are recorded in the worker processes)
+# Only the version name is passed; the bundle is looked up (or loaded, in a worker process) by version
+def predict_health(version, features, output=None):
+    bundle = health_models.get(version)
+    timer = metrics.stage_timer("model_stage_duration_seconds", model="health")
+    return predict_batch(bundle.model, bundle.scaler, features, output, timer)
+
+def predict_weather(version, features, output=None):
+    bundle = weather_models.get(version)
+    timer = metrics.stage_timer("model_stage_duration_seconds", model="weather")
+    return predict_batch(bundle.model, bundle.scaler, features, output, timer)
+
+# Concurrent requests for the same model output are coalesced into one predict call
+# Rows wait at most AQ_BATCH_WINDOW_MS (0 disables batching) or until AQ_BATCH_MAX_ROWS are pending
+batch_window = float(os.environ.get("AQ_BATCH_WINDOW_MS", 2)) / 1000
+batch_max_rows = int(os.environ.get("AQ_BATCH_MAX_ROWS", 512))
+health_aqi_batcher = MicroBatcher(predict_health, inference_executor.run, output=1,
+                                  max_wait=batch_window, max_rows=batch_max_rows)
+weather_temperature_batcher = MicroBatcher(predict_weather, inference_executor.run, output=0,
+                                           max_wait=batch_window, max_rows=batch_max_rows)
+
+# The endpoints that draw random dataset rows never need the model: when a version is activated,
+# its predictions for every row of the feature matrix are computed once (or mapped from the bundle)
+# and the endpoints index into them. Until the table of a new version is ready they use the batchers.
+health_predictions = PredictionTable()
+weather_predictions = PredictionTable()
+
+def make_table_builder(name, registry, table, get_feature_matrix, csv_file):
+    def build_table(previous, bundle):
+        matrix = get_feature_matrix()
+        sources = [os.path.join(bundle.path, registry.model_file), os.path.join(bundle.path, registry.scaler_file),
+                   *dataset_sources(csv_file)]
+        arrays, _ = load_artifact(f"predictions/{name}/{bundle.version}", sources,
+                                  lambda: ({"values": predict_batch(bundle.model, bundle.scaler, matrix.values)}, {}),
+                                  key=matrix.feature_names)
+        table.set(bundle.version, arrays["values"])
+    return build_table
+
+health_models.on_swap(make_table_builder("health", health_models, health_predictions, lambda: health_matrix,
+                                         HEALTH_DATASET))
+weather_models.on_swap(make_table_builder("weather", weather_models, weather_predictions, lambda: weather_matrix,
+                                          WEATHER_DATASET))
+
+# Predictions of dataset rows: one array lookup when the table holds the version, the batcher otherwise
+async def predict_dataset_rows(table, batcher, matrix, index, version):
+    predictions = table.lookup(version, index, batcher.output)
+    if predictions is None:
+        predictions = await batcher.predict(matrix.rows(index), version)
+    return predictions
+
+# Caller-supplied rows are memoized in an LRU of AQ_PREDICTION_CACHE_ROWS rows per model (0 disables it),
+# keyed by the version and the scaled features rounded to AQ_PREDICTION_CACHE_QUANTUM
+prediction_cache_rows = int(os.environ.get("AQ_PREDICTION_CACHE_ROWS", 100000))
+prediction_cache_quantum = float(os.environ.get("AQ_PREDICTION_CACHE_QUANTUM", 1e-6))
+prediction_caches = {name: PredictionCache(max_rows=prediction_cache_rows, quantum=prediction_cache_quantum)
+                     for name in model_registries}
+health_models.on_swap(lambda previous, bundle: prediction_caches["health"].clear())
+weather_models.on_swap(lambda previous, bundle: prediction_caches["weather"].clear())
+
+# Predictions of caller-supplied rows; only the rows missing from the LRU are sent to the model
+# The lookup, the prediction of the missing rows and the fill are one executor job, so none of them
+# runs on the event loop, and the rows are scaled once for both the cache keys and the model.
+# In process mode every worker process keeps its own LRU, and its hits are counted there.
+def predict_cached_rows(name, version, features):
+    bundle = model_registries[name].get(version)
+    cache = prediction_caches[name]
+    timer = metrics.stage_timer("model_stage_duration_seconds", model=name)
+    with timer("scale"):
+        features_scaled = bundle.scaler.transform(features)
+    keys, rows, missing = cache.lookup(version, features_scaled)
+    predictions = []
+    if len(missing):
+        predictions = predict_scaled(bundle.model, features_scaled[missing], timer=timer)
+    return cache.fill(keys, rows, missing, predictions)
+
+async def predict_cached(name, predict_fn, version, features):
+    if prediction_caches[name].max_items <= 0 or features.size == 0:
+        return await inference_executor.run(predict_fn, version, features)
+    return await inference_executor.run(predict_cached_rows, name, version, features)
+
+# Executor and batcher state, evaluated when /metrics is scraped
+metrics.gauge("inference_in_flight", lambda: inference_executor.stats()["in_flight"],
+              "Inference jobs running or queued")
+metrics.gauge("inference_rejected_total", lambda: inference_executor.stats()["rejected"],
+              "Inference jobs rejected because the queue was full", metric_type="counter")
+metrics.gauge("inference_timed_out_total", lambda: inference_executor.stats()["timed_out"],
+              "Inference jobs that exceeded their timeout", metric_type="counter")
+metrics.gauge("batcher_mean_batch_rows", lambda: {
+    "health_aqi": health_aqi_batcher.stats()["mean_batch_rows"],
+    "weather_temperature": weather_temperature_batcher.stats()["mean_batch_rows"],
+}, "Mean rows per micro-batch", label_name="batcher")
+metrics.gauge("prediction_table_hits_total",
+              lambda: {"health": health_predictions.hits, "weather": weather_predictions.hits},
+              "Dataset row lookups answered from the precomputed prediction table",
+              label_name="model", metric_type="counter")
+metrics.gauge("prediction_table_misses_total",
+              lambda: {"health": health_predictions.misses, "weather": weather_predictions.misses},
+              "Dataset row lookups that ran the model because the table was not ready",
+              label_name="model", metric_type="counter")
+metrics.gauge("prediction_cache_hits_total", lambda: {name: cache.hits for name, cache in prediction_caches.items()},
+              "Caller-supplied rows served from the prediction LRU", label_name="model", metric_type="counter")
+metrics.gauge("prediction_cache_misses_total",
+              lambda: {name: cache.misses for name, cache in prediction_caches.items()},
+              "Caller-supplied rows that had to be predicted", label_name="model", metric_type="counter")
+metrics.gauge("prediction_cache_rows", lambda: {name: len(cache) for name, cache in prediction_caches.items()},
+              "Rows held by the prediction LRU", label_name="model")
+metrics.gauge("model_swaps_total", lambda: {name: registry.swaps for name, registry in model_registries.items()},
+              "Model versions activated, including the initial load and rollbacks",
+              label_name="model", metric_type="counter")
+
+# Saturated or timed-out inference is reported as 503 so clients back off and retry
+@app.exception_handler(InferenceUnavailable)
+async def inference_unavailable_handler(request: Request, exc: InferenceUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# Prediction and trends responses are encoded in the format the Accept header asks for:
+# JSON by default, or MessagePack / Arrow IPC for bulk clients when msgpack / pyarrow are installed.
+# Endpoints pass NumPy arrays straight through, so no per-value Python conversion is needed.
+response_format_counts = {FORMAT_NAMES[media_type]: 0 for media_type in ENCODERS}
+metrics.gauge("responses_by_format_total", lambda: dict(response_format_counts),
+              "Prediction and trends responses by format", label_name="format", metric_type="counter")
+
+# Negotiated before any work is done, so unsupported formats are refused up front
+def response_media_type(request):
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported formats: {', '.join(ENCODERS)}")
+    return media_type
+
+def encoded_response(content, media_type, headers=None):
+    try:
+        body = encode(content, media_type)
+    except EncodingError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    response_format_counts[FORMAT_NAMES[media_type]] += 1
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept", **(headers or {})})
 
 # CustomAppBar.js
+# Compute the AQI and Temperature shown on the Navigation Bar
+async def compute_aqi_temperature():
+    timer = metrics.stage_timer("endpoint_stage_duration_seconds", endpoint="predict_aqi_temperature")
+
+    # Draw a random row for prediction from each feature matrix
+    with timer("feature_build"):
+        health_index = health_matrix.sample_index(1, rng)
+        weather_index = weather_matrix.sample_index(1, rng)
+    logging.debug("Weather features %s: %s", weather_matrix.feature_names, weather_matrix.rows(weather_index))
+
+    # Look both predictions up in the prediction tables (or make them as part of the next micro-batches)
+    # The second health output (AQI) and the first weather output are used
+    health_version = health_models.current.version
+    weather_version = weather_models.current.version
+    with timer("inference"):
+        predicted_aqi, predicted_temperature = await asyncio.gather(
+            predict_dataset_rows(health_predictions, health_aqi_batcher, health_matrix, health_index, health_version),
+            predict_dataset_rows(weather_predictions, weather_temperature_batcher, weather_matrix, weather_index,
+                                 weather_version),
+        )
+    logging.debug("Predicted AQI: %s, predicted temperature: %s", predicted_aqi, predicted_temperature)
+
+    # Extract the prediction values, rounded to 2 decimals
+    predicted_aqi_value = round(float(predicted_aqi[0]), 2) if predicted_aqi.size > 0 else None
+    predicted_temperature_value = round(float(predicted_temperature[0]), 2) if predicted_temperature.size > 0 else None
+
+    # Return the predictions
+    return {
+        'predicted_temperature': predicted_temperature_value,
+        'predicted_aqi': predicted_aqi_value,
+        'model_versions': {'health': health_version, 'weather': weather_version}
+    }
+
+# The prediction is recomputed every AQ_SNAPSHOT_INTERVAL seconds by a background task,
+# not per request, so its cost does not depend on how many clients are polling
+aqi_temperature_snapshot = Snapshot(compute_aqi_temperature, interval=float(os.environ.get("AQ_SNAPSHOT_INTERVAL", 600)))
+
+# Every refresh is also pushed to the clients of /api/stream/aqi_temperature
+# A client more than AQ_STREAM_QUEUE updates behind loses its oldest ones and is dropped after AQ_STREAM_MAX_DROPPED
+aqi_temperature_broadcaster = Broadcaster(max_queue=int(os.environ.get("AQ_STREAM_QUEUE", 4)),
+                                          max_dropped=int(os.environ.get("AQ_STREAM_MAX_DROPPED", 16)))
+
+# Serialize each update once as a server-sent event frame, shared by every client
+def publish_aqi_temperature(payload, etag):
+    frame = f"id: {etag}\nevent: aqi_temperature\ndata: {json.dumps(payload)}\n\n"
+    aqi_temperature_broadcaster.publish(frame.encode(), etag)
+
+aqi_temperature_snapshot.on_refresh(publish_aqi_temperature)
+
+metrics.gauge("stream_clients", lambda: aqi_temperature_broadcaster.stats()["subscribers"],
+              "Clients connected to the prediction stream")
+metrics.gauge("stream_events_dropped_total", lambda: aqi_temperature_broadcaster.stats()["dropped_events"],
+              "Updates dropped for slow stream clients", metric_type="counter")
+metrics.gauge("stream_slow_disconnects_total", lambda: aqi_temperature_broadcaster.stats()["disconnected_slow"],
+              "Stream clients disconnected for falling behind", metric_type="counter")
+
+# Recompute it with the new model as soon as a version is activated or rolled back;
+# the refresh runs on the event loop and is pushed to the stream clients
+health_models.on_swap(lambda previous, bundle: aqi_temperature_snapshot.invalidate())
+weather_models.on_swap(lambda previous, bundle: aqi_temperature_snapshot.invalidate())
+
 # API endpoint to predict AQI and Temperature on Navigation Bar
-@app.post("/api/predict_aqi_temperature")
-async def predict_aqi_temperature():
+# Served from the snapshot with ETag / Cache-Control so unchanged results can be answered with 304
+# (GET only: a 304 is not a valid answer to a POST, which always gets the full body)
+@app.api_route("/api/predict_aqi_temperature", methods=["GET", "POST"])
+async def predict_aqi_temperature(request: Request):
     try:
-        # Print column names for debugging
-        print("Weather Data Columns:", data_weather.columns.tolist())
-
-        # Extract a random row for prediction
-        random_row_health = data_health.sample()
-        random_row_weather = data_weather.sample()
-
-        # Prepare the features for the health model
-        health_features = np.array([[random_row_health['London Mean Roadside:Nitrogen Dioxide (ug/m3)'].values[0],
-                                      random_row_health['London Mean Roadside:PM10 Particulate (ug/m3)'].values[0],
-                                      random_row_health['London Mean Roadside:PM2.5 Particulate (ug/m3)'].values[0],
-                                      random_row_health['London Mean Roadside:Ozone (ug/m3)'].values[0],
-                                      random_row_health['London Mean Roadside:Sulphur Dioxide (ug/m3)'].values[0],
-                                      random_row_health['London Mean Background:Nitrogen Dioxide (ug/m3)'].values[0],
-                                      random_row_health['London Mean Background:Ozone (ug/m3)'].values[0],
-                                      random_row_health['London Mean Background:PM10 Particulate (ug/m3)'].values[0],
-                                      random_row_health['London Mean Background:PM2.5 Particulate (ug/m3)'].values[0],
-                                      random_row_health['London Mean Background:Sulphur Dioxide (ug/m3)'].values[0]]])
-
-        # Prepare the features for the weather model
-        weather_feature_names = [
-            'mean_temp',
-            'precipitation',
-            'wspd',
-            'pressure',
-            'Roadside_Nitrogen_Dioxide (ug/m3)',
-            'Roadside_Ozone (ug/m3)',
-            'Roadside_PM10_Particulate (ug/m3)',
-            'Roadside_PM2.5_Particulate (ug/m3)',
-            'Background_Nitrogen_Dioxide (ug/m3)',
-            'Background_Ozone (ug/m3)',
-            'Background_PM10_Particulate (ug/m3)',
-            'Background_PM2.5_Particulate (ug/m3)',
-            'Background_Sulphur Dioxide (ug/m3)'  
-        ]
-
-        # Create a weather features array while handling missing columns
-        weather_features = []
-        for col in weather_feature_names:
-            if col in random_row_weather.columns:
-                weather_features.append(random_row_weather[col].values[0])
-            else:
-                print(f"Column missing: {col}")  # Print a message if a column is missing
-
-        print(f"Extracted Weather Features: {weather_features}")  # Log the extracted features
-
-        if len(weather_features) != 13:
-            # Handle the case where Background Sulphur Dioxide is missing
-            if 'Background_Sulphur Dioxide (ug/m3)' not in random_row_weather.columns:
-                print("Background Sulphur Dioxide column is missing; proceeding with 12 features.")
-                weather_features.append(0)  # Append a default value if the column is missing
-
-        weather_features_array = np.array([weather_features]).reshape(1, -1)
-
-        # Scale the features
-        health_features_scaled = scaler_health.transform(health_features)
-        weather_features_scaled = scaler_weather.transform(weather_features_array)
-
-        # Make predictions
-        predicted_aqi = aq_health_model.predict(health_features_scaled)
-        predicted_temperature = aq_weather_model.predict(weather_features_scaled)
-
-        # Debugging: Check the shapes of predictions
-        print("Predicted AQI:", predicted_aqi, "Shape:", predicted_aqi.shape)
-        print("Predicted Temperature:", predicted_temperature, "Shape:", predicted_temperature.shape)
-
-        # Extract the first prediction value
-        predicted_aqi_value = round(float(predicted_aqi[0][1]), 2) if predicted_aqi.size > 1 else None  # Use the second value
-        predicted_temperature_value = round(float(predicted_temperature[0][0]), 2) if predicted_temperature.size > 0 else None  # Round to 2 decimals
-
-        # Return the predictions
-        return {
-            'predicted_temperature': predicted_temperature_value,
-            'predicted_aqi': predicted_aqi_value
+        payload = await aqi_temperature_snapshot.get()
+        headers = {
+            "ETag": aqi_temperature_snapshot.etag,
+            "Cache-Control": f"public, max-age={aqi_temperature_snapshot.max_age()}",
         }
 
+        if request.method == "GET" and etag_matches(request.headers.get("if-none-match"),
+                                                    aqi_temperature_snapshot.etag):
+            return Response(status_code=304, headers=headers)
+        with metrics.time("endpoint_stage_duration_seconds", endpoint="predict_aqi_temperature", stage="serialize"):
+            return JSONResponse(content=payload, headers=headers)
+
+    except InferenceUnavailable:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
+# App.js
+# Server-sent events with the navigation bar prediction, pushed whenever the snapshot is refreshed
+# The computation runs once per interval however many clients are connected
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.get("/api/stream/aqi_temperature")
+async def stream_aqi_temperature(request: Request):
+    subscription = aqi_temperature_broadcaster.subscribe()
+    subscribed_at = time.perf_counter()
+
+    async def events():
+        try:
+            while not subscription.closed:
+                event = await subscription.next(timeout=SSE_KEEPALIVE_SECONDS)
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    # Comment line so proxies keep the connection open
+                    yield b": keepalive\n\n"
+                    continue
+                # The replayed latest event on connect is not a fan-out
+                if event.published_at >= subscribed_at:
+                    metrics.observe("stream_fanout_seconds", time.perf_counter() - event.published_at,
+                                    stream="aqi_temperature")
+                yield event.data
+        finally:
+            subscription.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Health.js
+# Limits for the Monte Carlo hourly forecast
+# Every scenario x hour is one model row: the default 200 scenarios x 24 hours are 4800 rows,
+# which the compiled forest predicts in about 25 ms. AQ_FORECAST_SCENARIOS
+# lowers the default for smaller machines at the cost of noisier percentile bands.
+DEFAULT_FORECAST_SCENARIOS = int(os.environ.get("AQ_FORECAST_SCENARIOS", 200))
+MAX_FORECAST_HOURS = 168
+MAX_FORECAST_SCENARIOS = 1000
+MAX_FORECAST_ROWS = 50000
+
+# Request field for each health model feature; sulphur dioxide isn't part of the request,
+# so the historical median is used for it. The weather fields are not inputs of the health model.
+HOURLY_AQI_REQUEST_FIELDS = {
+    'London Mean Roadside:Nitrogen Dioxide (ug/m3)': 'roadside_nitrogen_dioxide',
+    'London Mean Roadside:PM10 Particulate (ug/m3)': 'roadside_pm10_particulate',
+    'London Mean Roadside:PM2.5 Particulate (ug/m3)': 'roadside_pm2_5_particulate',
+    'London Mean Roadside:Ozone (ug/m3)': 'roadside_ozone',
+    'London Mean Roadside:Sulphur Dioxide (ug/m3)': None,
+    'London Mean Background:Nitrogen Dioxide (ug/m3)': 'background_nitrogen_dioxide',
+    'London Mean Background:Ozone (ug/m3)': 'background_ozone',
+    'London Mean Background:PM10 Particulate (ug/m3)': 'background_pm10_particulate',
+    'London Mean Background:PM2.5 Particulate (ug/m3)': 'background_pm2_5_particulate',
+    'London Mean Background:Sulphur Dioxide (ug/m3)': None,
+}
+
 class HourlyAQIPredictRequest(BaseModel):
     hours_ahead: int
     mean_temp: float
@@ -132,48 +610,42 @@ class HourlyAQIPredictRequest(BaseModel):
     background_ozone: float
     background_pm10_particulate: float
     background_pm2_5_particulate: float
+    scenarios: int = DEFAULT_FORECAST_SCENARIOS
 
 @app.post("/api/predict_hourly_aqi/")
-async def predict_hourly_aqi(request: HourlyAQIPredictRequest):
+async def predict_hourly_aqi(request: HourlyAQIPredictRequest, http_request: Request):
+    media_type = response_media_type(http_request)
+    if not 1 <= request.hours_ahead <= MAX_FORECAST_HOURS:
+        raise HTTPException(status_code=400, detail=f"hours_ahead must be between 1 and {MAX_FORECAST_HOURS}.")
+    if not 1 <= request.scenarios <= MAX_FORECAST_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"scenarios must be between 1 and {MAX_FORECAST_SCENARIOS}.")
+    if request.hours_ahead * request.scenarios > MAX_FORECAST_ROWS:
+        raise HTTPException(status_code=400, detail=f"hours_ahead x scenarios must be at most {MAX_FORECAST_ROWS}.")
+
+    timer = metrics.stage_timer("endpoint_stage_duration_seconds", endpoint="predict_hourly_aqi")
     try:
-        # Prepare to store predictions
-        hourly_aqi_predictions = []
-
-        # Iterate through the next 24 hours
-        for hour in range(24):
-            # Sample a random row from the health data
-            random_health_row = data_health.sample()
-
-            # Extract features from the random health row
-            health_features = np.array([[
-                random_health_row['London Mean Roadside:Nitrogen Dioxide (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:PM10 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:PM2.5 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:Ozone (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:Sulphur Dioxide (ug/m3)'].values[0],
-                random_health_row['London Mean Background:Nitrogen Dioxide (ug/m3)'].values[0],
-                random_health_row['London Mean Background:Ozone (ug/m3)'].values[0],
-                random_health_row['London Mean Background:PM10 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Background:PM2.5 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Background:Sulphur Dioxide (ug/m3)'].values[0]
-            ]])
-
-            # Adjust health features based on the hour
-            # Example: Increment roadside PM2.5 as an artificial effect of time
-            health_features[0][2] += hour * 0.5  # Increase PM2.5 by 0.5 ug/m3 per hour as a sample change
-
-            # Scale the features and make the prediction
-            health_features_scaled = scaler_health.transform(health_features)
-
-            # Make the prediction for the current hour
-            predicted_aqi = aq_health_model.predict(health_features_scaled)
-
-            # Store the prediction
-            hourly_aqi_predictions.append(predicted_aqi[0][1])  # Assuming the second value is the desired prediction
-
-        # Return all predictions for the next 24 hours
-        return {"hourly_aqi": hourly_aqi_predictions}
+        # Start every scenario from the caller's readings and draw the path of each hour
+        with timer("feature_build"):
+            start = np.array([getattr(request, field) if field else median
+                              for field, median in zip(HOURLY_AQI_REQUEST_FIELDS.values(), health_feature_medians)])
+            paths = health_forecast_engine.scenarios(start, request.hours_ahead, request.scenarios, rng)
+            health_features = paths.reshape(-1, paths.shape[-1])
 
+        # Scale and predict every scenario and hour in one call
+        # The second output is the desired prediction
+        health_version = health_models.current.version
+        with timer("inference"):
+            predictions = await health_aqi_batcher.predict(health_features, health_version)
+
+        # Mean and p10/p50/p90 bands for each of the next hours
+        with timer("serialize"):
+            bands = summarize_scenarios(predictions.reshape(request.scenarios, request.hours_ahead))
+            return encoded_response({"hourly_aqi": bands.pop("mean"), "hourly_aqi_bands": bands,
+                                     "scenarios": request.scenarios,
+                                     "model_versions": {"health": health_version}}, media_type)
+
+    except InferenceUnavailable:
+        raise
     except Exception as e:
         logging.error(f"Error during AQI prediction: {str(e)}")
         return {"error": "An internal server error occurred."}
@@ -183,42 +655,48 @@ class WeeklyTemperaturePredictRequest(BaseModel):
     days_ahead: int = 7
 
 @app.post("/api/predict_weekly_temperature/")
-async def predict_weekly_temperature(request: WeeklyTemperaturePredictRequest):
+async def predict_weekly_temperature(request: WeeklyTemperaturePredictRequest, http_request: Request):
+    media_type = response_media_type(http_request)
+    if not 1 <= request.days_ahead <= MAX_DAYS_AHEAD:
+        raise HTTPException(status_code=400, detail=f"days_ahead must be between 1 and {MAX_DAYS_AHEAD}.")
+    timer = metrics.stage_timer("endpoint_stage_duration_seconds", endpoint="predict_weekly_temperature")
     try:
-        weekly_temperatures = []
-
-        for _ in range(request.days_ahead):
-            random_weather_row = data_weather.sample()
-
-            # Prepare features from random weather row (similar to your other predictions)
-            weather_features = [
-                random_weather_row['mean_temp'].values[0],
-                random_weather_row['precipitation'].values[0],
-                random_weather_row['wspd'].values[0],
-                random_weather_row['pressure'].values[0],
-                random_weather_row['Roadside_Nitrogen_Dioxide (ug/m3)'].values[0],
-                random_weather_row['Roadside_Ozone (ug/m3)'].values[0],
-                random_weather_row['Roadside_PM10_Particulate (ug/m3)'].values[0],
-                random_weather_row['Roadside_PM2.5_Particulate (ug/m3)'].values[0],
-                random_weather_row['Background_Nitrogen_Dioxide (ug/m3)'].values[0],
-                random_weather_row['Background_Ozone (ug/m3)'].values[0],
-                random_weather_row['Background_PM10_Particulate (ug/m3)'].values[0],
-                random_weather_row['Background_PM2.5_Particulate (ug/m3)'].values[0],
-                random_weather_row.get('Background_Sulphur Dioxide (ug/m3)', 0)  # Handle missing column
-            ]
-
-            weather_features_array = np.array([weather_features]).reshape(1, -1)
-            weather_features_scaled = scaler_weather.transform(weather_features_array)
-
-            predicted_temperature = aq_weather_model.predict(weather_features_scaled)
-            weekly_temperatures.append(round(float(predicted_temperature[0][0]), 2))
-
-        return {"weekly_temperatures": weekly_temperatures}
+        # Sample one random weather row per day and look up the whole week at once
+        with timer("feature_build"):
+            weather_index = weather_matrix.sample_index(request.days_ahead, rng)
+        weather_version = weather_models.current.version
+        with timer("inference"):
+            predicted_temperatures = await predict_dataset_rows(weather_predictions, weather_temperature_batcher,
+                                                                weather_matrix, weather_index, weather_version)
 
+        with timer("serialize"):
+            return encoded_response({"weekly_temperatures": np.round(predicted_temperatures, 2),
+                                     "model_versions": {"weather": weather_version}}, media_type)
+
+    except InferenceUnavailable:
+        raise
     except Exception as e:
         logging.error(f"Error during weekly temperature prediction: {str(e)}")
         return {"error": "An internal server error occurred."}
 
+# Health reports and contact messages are stored in SQLite (AQ_DB_PATH) through a write-behind queue
+# Up to AQ_DB_BATCH_ROWS rows or AQ_DB_BATCH_MS of submissions share one commit;
+# at most AQ_DB_MAX_PENDING may wait, after which submissions are answered with 503
+# The database is opened in the lifespan, so importing the app never creates it
+submission_store = SubmissionStore(DB_PATH)
+submission_writer = WriteBehindQueue(
+    submission_store,
+    max_batch=int(os.environ.get("AQ_DB_BATCH_ROWS", 256)),
+    max_delay=float(os.environ.get("AQ_DB_BATCH_MS", 20)) / 1000,
+    max_pending=int(os.environ.get("AQ_DB_MAX_PENDING", 10000)),
+)
+metrics.gauge("submissions_pending", lambda: submission_writer.stats()["pending"],
+              "Submissions waiting to be committed")
+metrics.gauge("submission_commit_mean_rows", lambda: submission_writer.stats()["mean_batch_rows"],
+              "Mean submissions per commit")
+metrics.gauge("submissions_rejected_total", lambda: submission_writer.stats()["rejected"],
+              "Submissions rejected because the write queue was full", metric_type="counter")
+
 # HealthReportDialog.js
 class HealthReport(BaseModel):
     firstName: str
@@ -235,84 +713,215 @@ class HealthReport(BaseModel):
     smokingStatus: str
 @app.post("/api/healthReport")
 async def submit_health_report(report: HealthReport):
-    # Process the report data
-    # You can add code here to save it to a database or further process it
-    return {"message": "Health report submitted successfully"}
+    try:
+        # Stored with the next group commit; returns once the report is on disk
+        report_id = await submission_writer.write("health_reports", report.email, report.model_dump())
+        return {"message": "Health report submitted successfully", "id": report_id}
+
+    except WriteQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logging.error(f"Error storing health report: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred while saving your health report.")
 
 # AQIChart.js
 class WeeklyAQIPredictRequest(BaseModel):
     days_ahead: int = 7
     
 @app.post("/api/predict_weekly_aqi/")
-async def predict_weekly_aqi(request: WeeklyAQIPredictRequest):
+async def predict_weekly_aqi(request: WeeklyAQIPredictRequest, http_request: Request):
+    media_type = response_media_type(http_request)
+    if not 1 <= request.days_ahead <= MAX_DAYS_AHEAD:
+        raise HTTPException(status_code=400, detail=f"days_ahead must be between 1 and {MAX_DAYS_AHEAD}.")
+    timer = metrics.stage_timer("endpoint_stage_duration_seconds", endpoint="predict_weekly_aqi")
     try:
-        weekly_aqi_predictions = []
-
-        for _ in range(request.days_ahead):
-            random_health_row = data_health.sample()
-
-            # Prepare features from random health row
-            health_features = np.array([[  # Ensure you adjust indices to match your model
-                random_health_row['London Mean Roadside:Nitrogen Dioxide (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:PM10 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:PM2.5 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:Ozone (ug/m3)'].values[0],
-                random_health_row['London Mean Roadside:Sulphur Dioxide (ug/m3)'].values[0],
-                random_health_row['London Mean Background:Nitrogen Dioxide (ug/m3)'].values[0],
-                random_health_row['London Mean Background:Ozone (ug/m3)'].values[0],
-                random_health_row['London Mean Background:PM10 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Background:PM2.5 Particulate (ug/m3)'].values[0],
-                random_health_row['London Mean Background:Sulphur Dioxide (ug/m3)'].values[0]
-            ]])
-
-            # Scale the features
-            health_features_scaled = scaler_health.transform(health_features)
-
-            # Make the prediction
-            predicted_aqi = aq_health_model.predict(health_features_scaled)
-            weekly_aqi_predictions.append(round(float(predicted_aqi[0][1]), 2)) 
-
-        return {"weekly_aqi": weekly_aqi_predictions}
+        # Sample one random health row per day and look up the whole week at once
+        with timer("feature_build"):
+            health_index = health_matrix.sample_index(request.days_ahead, rng)
+        health_version = health_models.current.version
+        with timer("inference"):
+            predicted_aqi = await predict_dataset_rows(health_predictions, health_aqi_batcher, health_matrix,
+                                                       health_index, health_version)
 
+        with timer("serialize"):
+            return encoded_response({"weekly_aqi": np.round(predicted_aqi, 2),
+                                     "model_versions": {"health": health_version}}, media_type)
+
+    except InferenceUnavailable:
+        raise
     except Exception as e:
         logging.error(f"Error during weekly AQI prediction: {str(e)}")
         return {"error": "An internal server error occurred."}
 
+# Batch clients
+class BatchPredictRequest(BaseModel):
+    model: str  # "health" or "weather"
+    rows: list[list[float]]
+
+@app.post("/api/predict_batch")
+async def predict_batch_rows(request: BatchPredictRequest, http_request: Request):
+    media_type = response_media_type(http_request)
+    # Pick the model, scaler and feature layout for the request
+    if request.model == "health":
+        predict_fn, feature_names = predict_health, HEALTH_FEATURE_NAMES
+    elif request.model == "weather":
+        predict_fn, feature_names = predict_weather, WEATHER_FEATURE_NAMES
+    else:
+        raise HTTPException(status_code=400, detail="Model must be 'health' or 'weather'.")
+
+    if len(request.rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ROWS} rows can be predicted per request.")
+    if any(len(row) != len(feature_names) for row in request.rows):
+        raise HTTPException(status_code=400, detail=f"Each row must contain {len(feature_names)} features.")
+
+    timer = metrics.stage_timer("endpoint_stage_duration_seconds", endpoint="predict_batch")
+    try:
+        # Scale and predict every row not in the LRU in a single call
+        with timer("feature_build"):
+            features = np.asarray(request.rows, dtype=np.float64)
+        version = model_registries[request.model].current.version
+        with timer("inference"):
+            predictions = await predict_cached(request.model, predict_fn, version, features)
+
+        with timer("serialize"):
+            return encoded_response({"model": request.model, "features": feature_names,
+                                     "predictions": predictions,
+                                     "model_versions": {request.model: version}}, media_type)
+
+    except InferenceUnavailable:
+        raise
+    except Exception as e:
+        logging.error(f"Error during batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred while running the batch prediction.")
+
 # AirQualityTrendsChart.js
 @app.get("/api/air_quality_trends")
-async def get_air_quality_trends():
+async def get_air_quality_trends(request: Request, pollutants: str = "PM2.5,NO2,Ozone", site: str = "roadside",
+                                 start_year: int | None = None, end_year: int | None = None,
+                                 granularity: str = "month"):
+    media_type = response_media_type(request)
     try:
-        # Filter data for the years you want to include
-        data_weather['date'] = pd.to_datetime(data_weather['date'], format='%Y-%m')
-        
-        # Extract month names and group by month to calculate average concentrations
-        data_weather['month'] = data_weather['date'].dt.month_name()
-
-        # Group by month and calculate average concentrations for each pollutant
-        monthly_trends = data_weather.groupby('month').agg(
-            PM2_5=('Roadside_PM2.5_Particulate (ug/m3)', 'mean'),
-            NO2=('Roadside_Nitrogen_Dioxide (ug/m3)', 'mean'),
-            Ozone=('Roadside_Ozone (ug/m3)', 'mean')
-        ).reset_index()
-
-        # Ensure the months are in order
-        month_order = ["January", "February", "March", "April", "May", "June",
-                       "July", "August", "September", "October", "November", "December"]
-        monthly_trends['month'] = pd.Categorical(monthly_trends['month'], categories=month_order, ordered=True)
-        monthly_trends = monthly_trends.sort_values('month')
-
-        # Prepare the data to return
-        trends = {
-            "months": monthly_trends['month'].tolist(),
-            "PM2.5": monthly_trends['PM2_5'].tolist(),
-            "NO2": monthly_trends['NO2'].tolist(),
-            "Ozone": monthly_trends['Ozone'].tolist()
-        }
-        return trends
+        # Answer from the pre-aggregated cube; repeated queries hit its cache
+        pollutant_list = [pollutant.strip() for pollutant in pollutants.split(",") if pollutant.strip()]
+        return encoded_response(trends_cube.query(pollutant_list, site, start_year, end_year, granularity), media_type)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return {"error": str(e)}
 
+# InteractiveMap.js
+# Monitoring sites and their readings; features a station file doesn't list use the historical median
+# None when no station file is configured, which disables the map endpoints
+def load_station_index():
+    if not STATIONS_FILE:
+        logging.info("No AQ_STATIONS_FILE configured; /api/stations/nearest and /api/predict_grid are disabled")
+        return None
+    if STATIONS_FILE == SAMPLE_STATIONS_FILE:
+        logging.warning(f"Serving the map endpoints from {SAMPLE_STATIONS_FILE}, which holds sample readings, "
+                        "not measurements")
+    stations_path = os.path.join(DATA_DIR, STATIONS_FILE)
+
+    def build():
+        import pandas as pd
+
+        return StationIndex.from_frame(pd.read_csv(stations_path), HEALTH_FEATURE_NAMES,
+                                       defaults=health_feature_medians).to_arrays()
+
+    arrays, metadata = load_artifact("stations", [stations_path, *dataset_sources(HEALTH_DATASET)], build,
+                                     key=HEALTH_FEATURE_NAMES)
+    return StationIndex.from_arrays(arrays, metadata)
+
+# Upper bound on the tiles predicted per /api/predict_grid request
+MAX_GRID_TILES = 4096
+MAX_NEAREST_STATIONS = 10
+STATIONS_ARE_SAMPLE = STATIONS_FILE == SAMPLE_STATIONS_FILE
+
+def require_stations():
+    if station_index is None:
+        raise HTTPException(status_code=404, detail="No station data is configured; set AQ_STATIONS_FILE to enable "
+                                                    "this endpoint.")
+
+# Per-tile AQI keyed by (zoom, x, y, k, model version); panning only predicts the newly visible tiles
+grid_tile_cache = TileCache(max_tiles=int(os.environ.get("AQ_GRID_CACHE_TILES", 100000)))
+health_models.on_swap(lambda previous, bundle: grid_tile_cache.clear())
+
+metrics.gauge("grid_tile_cache_hits_total", lambda: grid_tile_cache.hits,
+              "Map tiles served from the cache", metric_type="counter")
+metrics.gauge("grid_tile_cache_misses_total", lambda: grid_tile_cache.misses,
+              "Map tiles that had to be predicted", metric_type="counter")
+
+@app.get("/api/stations/nearest")
+async def get_nearest_stations(lat: float, lon: float, k: int = 3):
+    require_stations()
+    if not 1 <= k <= MAX_NEAREST_STATIONS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_NEAREST_STATIONS}.")
+    indices, distances = station_index.nearest([lat], [lon], k)
+    return {"stations": [{"name": station_index.names[i],
+                          "latitude": float(station_index.latitudes[i]),
+                          "longitude": float(station_index.longitudes[i]),
+                          "distance_km": round(float(distance), 3)}
+                         for i, distance in zip(indices[0], distances[0])],
+            "sample_data": STATIONS_ARE_SAMPLE}
+
+# bbox is "min_lon,min_lat,max_lon,max_lat"; every slippy map tile of the zoom level inside it is
+# predicted from the inverse-distance weighted readings of its k nearest stations.
+# Tiles are returned column-wise (x, y, latitude, longitude, aqi arrays) to keep large grids small.
+# sample_data is true when the readings come from SAMPLE_STATIONS_FILE rather than measurements.
+@app.get("/api/predict_grid")
+async def predict_grid(request: Request, bbox: str, zoom: int, k: int = 3):
+    media_type = response_media_type(request)
+    require_stations()
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(value) for value in bbox.split(",")]
+        x_min, x_max, y_min, y_max = tiles_for_bbox(min_lon, min_lat, max_lon, max_lat, zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox or zoom: {str(e)}")
+    if not 1 <= k <= MAX_NEAREST_STATIONS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_NEAREST_STATIONS}.")
+    n_tiles = (x_max - x_min + 1) * (y_max - y_min + 1)
+    if n_tiles > MAX_GRID_TILES:
+        raise HTTPException(status_code=400, detail=f"{n_tiles} tiles requested; zoom out or use a smaller bbox "
+                                                    f"(at most {MAX_GRID_TILES}).")
+
+    timer = metrics.stage_timer("endpoint_stage_duration_seconds", endpoint="predict_grid")
+    try:
+        health_version = health_models.current.version
+        with timer("feature_build"):
+            ys, xs = np.meshgrid(np.arange(y_min, y_max + 1), np.arange(x_min, x_max + 1), indexing="ij")
+            xs, ys = xs.ravel(), ys.ravel()
+            keys = [(zoom, int(x), int(y), k, health_version) for x, y in zip(xs, ys)]
+            cached = grid_tile_cache.get_many(keys)
+            missing = np.array([i for i, value in enumerate(cached) if value is None], dtype=np.int64)
+            lats, lons = tile_centers(xs, ys, zoom)
+
+        # Predict all uncached tiles in one batched call
+        aqi = np.array([np.nan if value is None else value for value in cached])
+        if len(missing):
+            with timer("feature_build"):
+                features = station_index.interpolate(lats[missing], lons[missing], k)
+            with timer("inference"):
+                predictions = await health_aqi_batcher.predict(features, health_version)
+            aqi[missing] = np.round(predictions, 2)
+            grid_tile_cache.put_many([keys[i] for i in missing], aqi[missing].tolist())
+
+        with timer("serialize"):
+            return encoded_response({
+                "zoom": zoom,
+                "x": xs, "y": ys,
+                "latitude": np.round(lats, 6), "longitude": np.round(lons, 6),
+                "aqi": aqi,
+                "cached_tiles": n_tiles - len(missing),
+                "sample_data": STATIONS_ARE_SAMPLE,
+                "model_versions": {"health": health_version},
+            }, media_type)
+
+    except InferenceUnavailable:
+        raise
+    except Exception as e:
+        logging.error(f"Error during grid prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred while predicting the grid.")
+
 # ContactDialog.js
 class ContactMessage(BaseModel):
     email: EmailStr
@@ -321,12 +930,168 @@ class ContactMessage(BaseModel):
 @app.post("/api/contact")
 async def submit_contact_form(contact_message: ContactMessage):
     try:
-        # Here, you could process the message (e.g., send an email, save to a database, etc.)
-        logging.info(f"Received contact message from {contact_message.email}: {contact_message.message}")
+        logging.info(f"Received contact message from {contact_message.email}")
+        await submission_writer.write("contact_messages", contact_message.email,
+                                      {"message": contact_message.message})
 
         # Send a response back to the client
         return {"status": "success", "message": "Your message has been sent."}
     
+    except WriteQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logging.error(f"Error processing contact message: {str(e)}")
-        raise HTTPException(status_code=500, detail="An error occurred while processing your message.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An error occurred while processing your message.")
+
+# Administration endpoints check the X-Admin-Token header against AQ_ADMIN_TOKEN
+# They are disabled while no token is configured
+def require_admin(request):
+    admin_token = os.environ.get("AQ_ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Set AQ_ADMIN_TOKEN to enable this endpoint.")
+    if request.headers.get("x-admin-token") != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+# Stored submissions, newest first; pass next_cursor back as cursor for the following page
+# They contain personal data, so these endpoints only work with AQ_ADMIN_TOKEN set
+MAX_SUBMISSIONS_PAGE = 500
+
+async def query_submissions(request, table, email, cursor, limit):
+    require_admin(request)
+    if not 1 <= limit <= MAX_SUBMISSIONS_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SUBMISSIONS_PAGE}.")
+    try:
+        return await asyncio.to_thread(submission_store.query, table, email, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/healthReports")
+async def list_health_reports(request: Request, email: str | None = None, cursor: str | None = None, limit: int = 50):
+    return await query_submissions(request, "health_reports", email, cursor, limit)
+
+@app.get("/api/contact/messages")
+async def list_contact_messages(request: Request, email: str | None = None, cursor: str | None = None, limit: int = 50):
+    return await query_submissions(request, "contact_messages", email, cursor, limit)
+
+# Model administration
+# If AQ_ADMIN_TOKEN is set, rollbacks must send it in the X-Admin-Token header
+def get_model_registry(name):
+    if name not in model_registries:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'.")
+    return model_registries[name]
+
+@app.get("/api/models")
+async def get_model_versions():
+    return {name: registry.status() for name, registry in model_registries.items()}
+
+@app.post("/api/models/{name}/rollback")
+async def rollback_model(name: str, request: Request):
+    require_admin(request)
+
+    registry = get_model_registry(name)
+    try:
+        # Loading an evicted version reads from disk, so keep it off the event loop
+        bundle = await asyncio.to_thread(registry.rollback)
+        return {"model": name, "version": bundle.version}
+
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error rolling back {name} model: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred while rolling back the model.")
+
+# Startup: load every artifact, recording how long each stage takes
+# Runs in the lifespan before the first request; python main.py --build-artifacts runs it ahead of time
+startup_timings = {}
+ready = False
+
+metrics.gauge("startup_stage_seconds", lambda: dict(startup_timings),
+              "Time spent in each stage of loading the models and data", label_name="stage")
+
+@contextmanager
+def startup_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = time.perf_counter() - start
+
+def load_state():
+    global health_matrix, weather_matrix, health_feature_medians, health_forecast_engine
+    global trends_cube, station_index, ready
+    if ready:
+        return
+    start = time.perf_counter()
+    with startup_stage("features"):
+        health_matrix, health_metadata = load_feature_matrix("health", HEALTH_DATASET, HEALTH_FEATURE_NAMES)
+        weather_matrix, _ = load_feature_matrix("weather", WEATHER_DATASET, WEATHER_FEATURE_NAMES)
+    # Hourly AQI forecasts resample the historical month-to-month changes of the health features,
+    # rescaled to one-hour steps
+    with startup_stage("forecast"):
+        health_feature_medians = np.nanmedian(health_matrix.values, axis=0)
+        health_forecast_engine = ForecastEngine(health_matrix.values, step_fraction=health_metadata["step_fraction"])
+    with startup_stage("trends"):
+        trends_cube = load_trends_cube()
+    with startup_stage("stations"):
+        station_index = load_station_index()
+    with startup_stage("models"):
+        health_models.check_for_updates()
+        weather_models.check_for_updates()
+    startup_timings["total"] = time.perf_counter() - start
+    ready = True
+    logging.info("Startup took " + ", ".join(f"{stage} {seconds * 1000:.1f} ms"
+                                             for stage, seconds in startup_timings.items()))
+
+# Readiness probe: 503 until the models and data are loaded
+@app.get("/readyz")
+async def readyz():
+    if not ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True,
+            "model_versions": {name: registry.current.version for name, registry in model_registries.items()},
+            "startup_ms": {stage: round(seconds * 1000, 1) for stage, seconds in startup_timings.items()}}
+
+# Prometheus scrape endpoint with per-stage latency histograms
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Opt-in sampling profiler; the endpoints exist only when AQ_ENABLE_PROFILER=1
+# They sample every thread of the process and expose its stacks, so they also need AQ_ADMIN_TOKEN
+profiler = SamplingProfiler(interval=float(os.environ.get("AQ_PROFILER_INTERVAL_MS", 5)) / 1000)
+
+if os.environ.get("AQ_ENABLE_PROFILER") == "1":
+    @app.post("/api/debug/profiler")
+    async def toggle_profiler(request: Request, enabled: bool, reset: bool = False):
+        require_admin(request)
+        if reset:
+            profiler.reset()
+        if enabled:
+            profiler.start()
+        else:
+            profiler.stop()
+        return {"running": profiler.running, "samples": profiler.total_samples}
+
+    # Collapsed stacks, ready for flame graph tools
+    @app.get("/api/debug/profiler")
+    async def get_profile(request: Request, limit: int = 200):
+        require_admin(request)
+        return PlainTextResponse(profiler.collapsed(limit))
+
+# python main.py --build-artifacts writes the artifact bundle ahead of time (e.g. when building the
+# container image), so workers start by mapping it instead of reading the CSVs and pickles
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Air quality API maintenance")
+    parser.add_argument("--build-artifacts", action="store_true",
+                        help="build the artifact bundle in AQ_SHARED_DIR for the current models and data")
+    args = parser.parse_args()
+    if not args.build_artifacts:
+        parser.error("nothing to do; start the server with uvicorn main:app")
+    if shared_artifacts is None:
+        parser.error("AQ_SHARED_DIR is empty, so there is no bundle to build")
+    load_state()
+    print(f"Artifact bundle in {SHARED_DIR}: {shared_artifacts.nbytes / 2**20:.2f} MB")
+    for name in sorted(shared_artifacts.mapped):
+        print(f"  {name}")
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+from utils.incremental_ridge import IncrementalRidge
+
+FEATURES = ["a", "b", "c", "d", "e"]
+TARGETS = ["t", "u"]
+
+def make_data(n_rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Very different scales and offsets, so the scaler matters
+    X = rng.normal(size=(n_rows, len(FEATURES))) * [1, 10, 100, 0.1, 5] + [0, 3, -50, 1, 2]
+    y = X @ rng.normal(size=(len(FEATURES), len(TARGETS))) + rng.normal(size=(n_rows, len(TARGETS)))
+    return X, y
+
+# Equal up to float rounding, relative to the largest value compared
+def assert_close(actual, expected, tolerance=1e-13):
+    expected = np.asarray(expected)
+    np.testing.assert_allclose(actual, expected, rtol=tolerance, atol=tolerance * np.abs(expected).max())
+
+def full_refit(X, y, alpha):
+    scaler = StandardScaler().fit(X)
+    return Ridge(alpha=alpha).fit(scaler.transform(X), y), scaler
+
+@pytest.mark.parametrize("alpha", [0.1, 10.0, 1000.0])
+def test_matches_full_refit(alpha):
+    X, y = make_data()
+    ridge = IncrementalRidge(FEATURES, TARGETS)
+    for start in range(0, len(X), 137):
+        ridge.partial_fit(X[start:start + 137], y[start:start + 137])
+
+    model, scaler = ridge.to_sklearn(alpha)
+    expected_model, expected_scaler = full_refit(X, y, alpha)
+    assert scaler.n_samples_seen_ == len(X)
+    assert_close(scaler.mean_, expected_scaler.mean_)
+    assert_close(scaler.scale_, expected_scaler.scale_)
+    assert_close(model.coef_, expected_model.coef_)
+    assert_close(model.intercept_, expected_model.intercept_)
+    # The returned scaler was fitted with feature names, like the grid-searched one
+    rows = pd.DataFrame(X, columns=FEATURES)
+    assert_close(model.predict(scaler.transform(rows)), expected_model.predict(expected_scaler.transform(X)))
+
+# Appending rows from DataFrames and reloading the saved statistics gives the same fit
+def test_frames_and_save(tmp_path):
+    X, y = make_data()
+    ridge = IncrementalRidge(FEATURES, TARGETS)
+    ridge.partial_fit(pd.DataFrame(X[:600], columns=FEATURES), pd.DataFrame(y[:600], columns=TARGETS))
+    ridge.save(tmp_path / "stats.npz")
+    ridge = IncrementalRidge.load(tmp_path / "stats.npz")
+    # Columns are picked by name, in any order
+    ridge.partial_fit(pd.DataFrame(X[600:], columns=FEATURES)[FEATURES[::-1]], pd.DataFrame(y[600:], columns=TARGETS))
+
+    model, _ = ridge.to_sklearn(1.0)
+    expected_model, _ = full_refit(X, y, 1.0)
+    assert_close(model.coef_, expected_model.coef_)
+
+def test_constant_feature_is_left_unscaled():
+    X, y = make_data()
+    X[:, 3] = 4.0
+    ridge = IncrementalRidge(FEATURES, TARGETS).partial_fit(X, y)
+    model, scaler = ridge.to_sklearn(1.0)
+    expected_model, expected_scaler = full_refit(X, y, 1.0)
+    assert scaler.scale_[3] == expected_scaler.scale_[3] == 1.0
+    assert_close(model.coef_, expected_model.coef_)
+
+def test_select_alpha_returns_a_candidate():
+    X, y = make_data()
+    alphas = [0.01, 1.0, 100.0, 1e4]
+    alpha, gcv = IncrementalRidge(FEATURES, TARGETS).partial_fit(X, y).select_alpha(alphas)
+    assert alpha in alphas
+    assert gcv.shape == (len(alphas),)
+
+def test_rejects_bad_input():
+    ridge = IncrementalRidge(FEATURES, TARGETS)
+    with pytest.raises(ValueError):
+        ridge.solve([1.0])
+    with pytest.raises(ValueError):
+        ridge.partial_fit(np.zeros((3, len(FEATURES))), np.zeros((2, len(TARGETS))))
+    with pytest.raises(ValueError):
+        ridge.partial_fit(pd.DataFrame(np.zeros((3, 2)), columns=["a", "b"]), np.zeros((3, len(TARGETS))))
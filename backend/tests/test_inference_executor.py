@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils.inference_executor import ExecutorSaturated, InferenceExecutor, InferenceTimeout
+
+def add(a, b):
+    return a + b
+
+def test_runs_jobs():
+    executor = InferenceExecutor(max_workers=2)
+    try:
+        assert asyncio.run(executor.run(add, 2, 3)) == 5
+        assert executor.stats()["in_flight"] == 0
+    finally:
+        executor.shutdown()
+
+def test_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        InferenceExecutor(mode="gpu")
+
+# With every worker and queue slot taken, new jobs are rejected at once
+def test_saturated_executor_rejects_jobs():
+    executor = InferenceExecutor(max_workers=1, max_queue=1, timeout=5.0)
+    release = threading.Event()
+
+    async def main():
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(executor.capacity)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(add, 1, 1)
+        release.set()
+        await asyncio.gather(*blocked)
+        # The slots are free again once the jobs finish
+        return await executor.run(add, 1, 1)
+
+    try:
+        assert asyncio.run(main()) == 2
+        assert executor.stats()["rejected"] == 1
+        assert executor.stats()["in_flight"] == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+# A slow job times out for its caller but keeps its slot until it actually finishes
+def test_timeout_keeps_the_slot_until_the_job_ends():
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(InferenceTimeout):
+            await executor.run(release.wait, timeout=0.05)
+        assert executor.stats()["in_flight"] == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(add, 1, 1)
+        release.set()
+        while executor.stats()["in_flight"]:
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(main())
+        assert executor.stats()["timed_out"] == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+# The app answers saturation with 503 and Retry-After
+def test_saturation_is_answered_with_503():
+    import main
+
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+    app = FastAPI()
+    app.add_exception_handler(main.InferenceUnavailable, main.inference_unavailable_handler)
+
+    @app.get("/blocked")
+    async def blocked():
+        return await executor.run(release.wait)
+
+    @app.get("/add")
+    async def run_add():
+        return await executor.run(add, 1, 1)
+
+    try:
+        with TestClient(app) as client:
+            thread = threading.Thread(target=client.get, args=("/blocked",))
+            thread.start()
+            while not executor.stats()["in_flight"]:
+                time.sleep(0.01)
+            response = client.get("/add")
+            release.set()
+            thread.join()
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,74 @@
+import asyncio
+
+import numpy as np
+
+from utils.micro_batcher import MicroBatcher
+
+# (key, rows) of every model call
+calls = []
+
+# Row sums tagged with the key, so every result row shows which request and key it came from
+def predict(key, features, output):
+    calls.append((key, len(features)))
+    return features.sum(axis=1) + (1000 if key == "b" else 0)
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+def make_requests(n_requests, rows=3):
+    return [np.arange(rows * 2, dtype=np.float64).reshape(rows, 2) + 10 * i for i in range(n_requests)]
+
+# Concurrent requests share one model call and each gets back exactly its own rows
+def test_scatters_rows_back_to_each_caller():
+    calls.clear()
+    batcher = MicroBatcher(predict, run_inline, max_wait=0.01)
+    requests = make_requests(5)
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict(features) for features in requests))
+
+    results = asyncio.run(main())
+    assert calls == [(None, 15)]
+    for features, result in zip(requests, results):
+        np.testing.assert_array_equal(result, features.sum(axis=1))
+    assert batcher.stats()["batches"] == 1
+    assert batcher.stats()["pending_rows"] == 0
+
+# Rows under different keys are never predicted together
+def test_batches_per_key():
+    calls.clear()
+    batcher = MicroBatcher(predict, run_inline, max_wait=0.01)
+    requests = make_requests(4)
+    keys = ["a", "b", "a", "b"]
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict(f, key=k) for f, k in zip(requests, keys)))
+
+    results = asyncio.run(main())
+    assert sorted(calls) == [("a", 6), ("b", 6)]
+    for features, key, result in zip(requests, keys, results):
+        np.testing.assert_array_equal(result, features.sum(axis=1) + (1000 if key == "b" else 0))
+
+# Reaching max_rows flushes at once instead of waiting for the timer
+def test_flushes_when_full():
+    calls.clear()
+    batcher = MicroBatcher(predict, run_inline, max_wait=60.0, max_rows=6)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.predict(f) for f in make_requests(2))), 5)
+
+    asyncio.run(main())
+    assert calls == [(None, 6)]
+
+# A failing batch raises in every caller that was part of it
+def test_errors_reach_every_caller():
+    async def failing_run(fn, *args):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(predict, failing_run, max_wait=0.01)
+
+    async def main():
+        return await asyncio.gather(*(batcher.predict(f) for f in make_requests(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
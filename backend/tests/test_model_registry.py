@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from utils.model_registry import BASE_VERSION, ModelRegistry
+
+# Model and scaler files only need to exist; the loader hands back the version name as the model
+def write_version(models_dir, version=BASE_VERSION):
+    path = models_dir if version == BASE_VERSION else models_dir / version
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "model.pkl").write_bytes(b"")
+    (path / "scaler.pkl").write_bytes(b"")
+
+def load_version(version, path):
+    return version, None
+
+# Versions named "...-bad" fail their warm-up prediction
+def validate(bundle):
+    if bundle.model.endswith("-bad"):
+        raise ValueError("warm-up prediction failed")
+
+def make_registry(models_dir, versions, loader=load_version):
+    for version in versions:
+        write_version(models_dir, version)
+    registry = ModelRegistry("test", str(models_dir), "model.pkl", "scaler.pkl", validate=validate,
+                             poll_interval=0, loader=loader)
+    swaps = []
+    registry.on_swap(lambda old, new: swaps.append((old.version if old else None, new.version)))
+    return registry, swaps
+
+def test_activates_the_newest_version(tmp_path):
+    registry, swaps = make_registry(tmp_path, [BASE_VERSION, "v2", "v10"])
+    assert registry.available_versions() == [BASE_VERSION, "v2", "v10"]
+    assert registry.check_for_updates().version == "v10"
+    assert registry.check_for_updates() is None
+    assert swaps == [(None, "v10")]
+
+    write_version(tmp_path, "v11")
+    assert registry.check_for_updates().version == "v11"
+    assert registry.status()["previous"] == ["v10"]
+    assert swaps[-1] == ("v10", "v11")
+
+# A version that fails validation is rejected and the active one keeps serving
+def test_rejects_a_failing_version(tmp_path):
+    registry, swaps = make_registry(tmp_path, ["v1"])
+    registry.check_for_updates()
+    write_version(tmp_path, "v2-bad")
+
+    assert registry.check_for_updates() is None
+    assert registry.current.version == "v1"
+    assert registry.rejected == {"v2-bad"}
+    assert swaps == [(None, "v1")]
+
+    # A newer good version is still picked up
+    write_version(tmp_path, "v3")
+    assert registry.check_for_updates().version == "v3"
+
+def test_first_load_failure_raises(tmp_path):
+    registry, _ = make_registry(tmp_path, ["v1-bad"])
+    with pytest.raises(ValueError):
+        registry.check_for_updates()
+
+def test_rollback_is_not_undone_by_the_watcher(tmp_path):
+    registry, swaps = make_registry(tmp_path, ["v1"])
+    registry.check_for_updates()
+    write_version(tmp_path, "v2")
+    registry.check_for_updates()
+
+    assert registry.rollback().version == "v1"
+    assert registry.rejected == {"v2"}
+    assert registry.check_for_updates() is None
+    assert registry.current.version == "v1"
+    assert swaps[-1] == ("v2", "v1")
+    with pytest.raises(LookupError):
+        registry.rollback()
+
+    # Activating the rolled back version by hand lifts the rejection
+    assert registry.activate("v2").version == "v2"
+    assert registry.rejected == set()
+
+# A rollback while the watcher is still loading the same version wins over the watcher
+def test_rollback_during_load_is_kept(tmp_path):
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_loader(version, path):
+        if version == "v2" and threading.current_thread().name == "watcher":
+            loading.set()
+            release.wait(5)
+        return load_version(version, path)
+
+    registry, _ = make_registry(tmp_path, ["v1"], loader=slow_loader)
+    registry.check_for_updates()
+    write_version(tmp_path, "v2")
+
+    result = []
+    watcher = threading.Thread(target=lambda: result.append(registry.check_for_updates()), name="watcher")
+    watcher.start()
+    assert loading.wait(5)
+    registry.activate("v2")
+    registry.rollback()
+    release.set()
+    watcher.join()
+
+    assert result == [None]
+    assert registry.current.version == "v1"
+    assert "v2" in registry.rejected
@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils import response_encoding
+from utils.response_encoding import (ARROW_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, encode_json,
+                                     negotiate)
+
+# Negotiation only looks at which media types have an encoder
+@pytest.fixture
+def all_formats(monkeypatch):
+    monkeypatch.setattr(response_encoding, "ENCODERS",
+                        {JSON_MEDIA_TYPE: None, MSGPACK_MEDIA_TYPE: None, ARROW_MEDIA_TYPE: None})
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON_MEDIA_TYPE),
+    ("", JSON_MEDIA_TYPE),
+    ("*/*", JSON_MEDIA_TYPE),
+    ("application/*", JSON_MEDIA_TYPE),
+    ("application/msgpack", MSGPACK_MEDIA_TYPE),
+    ("Application/X-MsgPack", MSGPACK_MEDIA_TYPE),
+    ("application/vnd.msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/vnd.apache.arrow.stream", ARROW_MEDIA_TYPE),
+    # Highest q-value wins, ties go to the first listed
+    ("application/json;q=0.5, application/msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/msgpack;q=0.8, application/vnd.apache.arrow.stream;q=0.9", ARROW_MEDIA_TYPE),
+    ("application/vnd.apache.arrow.stream, application/msgpack", ARROW_MEDIA_TYPE),
+    ("text/html, application/msgpack;q=0.1", MSGPACK_MEDIA_TYPE),
+    ("text/html, */*;q=0.1", JSON_MEDIA_TYPE),
+    # q=0 and malformed q-values rule a type out
+    ("application/msgpack;q=0, application/json;q=0.1", JSON_MEDIA_TYPE),
+    ("application/msgpack;q=high", None),
+    ("text/html", None),
+    ("application/json;q=0", None),
+])
+def test_negotiate(all_formats, accept, expected):
+    assert negotiate(accept) == expected
+
+# Formats whose package is missing are never picked
+def test_negotiate_skips_unavailable_formats(monkeypatch):
+    monkeypatch.setattr(response_encoding, "ENCODERS", {JSON_MEDIA_TYPE: None})
+    assert negotiate("application/msgpack") is None
+    assert negotiate("application/msgpack, application/json;q=0.5") == JSON_MEDIA_TYPE
+
+def test_json_writes_arrays_and_nan_as_null():
+    content = {"values": np.array([1.5, np.nan]), "count": np.int64(2), "mean": np.float64("nan")}
+    assert json.loads(encode_json(content)) == {"values": [1.5, None], "count": 2, "mean": None}
+
+def test_msgpack_arrays_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    values = np.arange(12, dtype=np.float64).reshape(3, 4)
+    packed = msgpack.unpackb(response_encoding.encode_msgpack({"values": values}), raw=False)["values"]
+    restored = np.frombuffer(packed["data"], dtype=packed["dtype"]).reshape(packed["shape"])
+    np.testing.assert_array_equal(restored, values)
+
+def test_arrow_columns_and_payload():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    content = {"hours": np.arange(3), "forecast": {"aqi": np.ones((3, 2))}, "station": "north"}
+    table = pyarrow.ipc.open_stream(response_encoding.encode_arrow(content)).read_all()
+    assert table.column_names == ["hours", "forecast.aqi.0", "forecast.aqi.1"]
+    assert json.loads(table.schema.metadata[b"payload"]) == {"station": "north"}
+    with pytest.raises(response_encoding.EncodingError):
+        response_encoding.encode_arrow({"a": np.ones(2), "b": np.ones(3)})
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from utils.snapshot import Snapshot, etag_matches
+
+def make_snapshot(results):
+    calls = []
+
+    async def compute():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        result = results[min(len(calls), len(results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return Snapshot(compute, interval=60), calls
+
+# The ETag follows the content: equal payloads share it, a changed payload gets a new one
+def test_etag_follows_the_payload():
+    snapshot, _ = make_snapshot([{"aqi": 1, "temperature": 20}, {"temperature": 20, "aqi": 1}, {"aqi": 2}])
+
+    async def main():
+        etags = []
+        for _ in range(3):
+            await snapshot.refresh()
+            etags.append(snapshot.etag)
+        return etags
+
+    first, same, changed = asyncio.run(main())
+    assert first == same != changed
+    assert first.startswith('"') and first.endswith('"')
+    assert 0 < snapshot.max_age() <= 60
+
+# Requests arriving during a refresh wait for it instead of starting their own
+def test_concurrent_requests_share_one_refresh():
+    snapshot, calls = make_snapshot([{"aqi": 1}])
+
+    async def main():
+        return await asyncio.gather(*(snapshot.get() for _ in range(10)))
+
+    assert asyncio.run(main()) == [{"aqi": 1}] * 10
+    assert len(calls) == 1
+
+def test_failed_refresh_keeps_the_previous_payload():
+    snapshot, _ = make_snapshot([{"aqi": 1}, RuntimeError("model failed")])
+
+    async def main():
+        await snapshot.refresh()
+        etag = snapshot.etag
+        with pytest.raises(RuntimeError):
+            await snapshot.refresh()
+        return etag, await snapshot.get()
+
+    etag, payload = asyncio.run(main())
+    assert payload == {"aqi": 1}
+    assert snapshot.etag == etag
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') == expected
+
+# Conditional GETs are answered with 304; POSTs always get the full body
+def test_endpoint_answers_conditional_get_with_304(monkeypatch):
+    import main
+
+    async def compute():
+        return {"aqi": 42.0, "temperature": 18.5}
+
+    snapshot = Snapshot(compute, interval=60)
+    monkeypatch.setattr(main, "aqi_temperature_snapshot", snapshot)
+    # Without the lifespan, so the real models are not loaded
+    client = TestClient(main.app)
+
+    response = client.get("/api/predict_aqi_temperature")
+    assert response.status_code == 200
+    assert response.json() == {"aqi": 42.0, "temperature": 18.5}
+    etag = response.headers["ETag"]
+    assert etag == snapshot.etag
+
+    response = client.get("/api/predict_aqi_temperature", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.post("/api/predict_aqi_temperature", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == {"aqi": 42.0, "temperature": 18.5}
+
+    response = client.get("/api/predict_aqi_temperature", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
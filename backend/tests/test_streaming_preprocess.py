@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.streaming_preprocess import IQR_FACTOR, KLLSketch, estimate_fences, stream_iqr_filter
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+# Normalized ranks of the estimates in the exact data; ties count as any rank they span
+def rank_errors(sorted_values, estimates, quantiles):
+    n = len(sorted_values)
+    low = np.searchsorted(sorted_values, estimates, side="left") / n
+    high = np.searchsorted(sorted_values, estimates, side="right") / n
+    return np.maximum(low - quantiles, quantiles - high).clip(0.0, None)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sketch_within_rank_error(seed):
+    values = np.random.default_rng(seed).lognormal(size=200_000)
+    sketch = KLLSketch(k=200, seed=seed)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+
+    assert sketch.n == len(values)
+    assert sketch.retained < 4 * sketch.k
+    errors = rank_errors(np.sort(values), sketch.quantile(QUANTILES), QUANTILES)
+    assert errors.max() <= sketch.rank_error()
+
+def test_merged_sketches_within_rank_error():
+    rng = np.random.default_rng(7)
+    parts = [rng.normal(size=50_000), rng.exponential(size=80_000), rng.uniform(-3, 3, size=30_000)]
+    sketch = KLLSketch(k=200, seed=0)
+    for i, part in enumerate(parts):
+        sketch.merge(KLLSketch(k=200, seed=i + 1).update(part))
+
+    values = np.sort(np.concatenate(parts))
+    assert sketch.n == len(values)
+    assert rank_errors(values, sketch.quantile(QUANTILES), QUANTILES).max() <= sketch.rank_error()
+
+def test_small_inputs_are_exact():
+    sketch = KLLSketch(k=200).update([3.0, np.nan, 1.0, 2.0])
+    assert sketch.n == 3
+    assert sketch.quantile(0.0) == 1.0
+    assert sketch.quantile(1.0) == 3.0
+    assert np.isnan(KLLSketch().quantile(0.5))
+
+def write_dataset(path, n_rows=60_000, seed=3):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "row": np.arange(n_rows),
+        "pm10": rng.lognormal(2.5, 0.6, n_rows),
+        "ozone": rng.normal(40.0, 12.0, n_rows),
+        "site": rng.choice(["roadside", "background"], n_rows),
+    })
+    data.loc[rng.choice(n_rows, 500, replace=False), "ozone"] = np.nan
+    data.to_csv(path, index=False)
+    return data
+
+# The exact quartiles lie inside the bands reported with the estimates
+def test_fence_bands_contain_exact_quartiles(tmp_path):
+    path = tmp_path / "data.csv"
+    data = write_dataset(path).dropna()
+    fences, rows = estimate_fences(path, chunksize=7_000)
+
+    assert rows == len(data)
+    assert set(fences) == {"row", "pm10", "ozone"}
+    for column, fence in fences.items():
+        for estimate in (fence.q1, fence.q3):
+            exact = np.quantile(data[column], estimate.q)
+            assert estimate.low <= exact <= estimate.high
+
+# At most uncertain_rows rows are classified differently than by the exact in-memory IQR filter
+def test_filter_differs_from_exact_by_at_most_the_reported_bound(tmp_path):
+    path = tmp_path / "data.csv"
+    data = write_dataset(path).dropna()
+    report = stream_iqr_filter(path, tmp_path / "filtered.csv", chunksize=7_000)
+
+    keep = np.ones(len(data), dtype=bool)
+    for column in report["fences"]:
+        q1, q3 = data[column].quantile([0.25, 0.75])
+        iqr = q3 - q1
+        keep &= data[column].between(q1 - IQR_FACTOR * iqr, q3 + IQR_FACTOR * iqr).to_numpy()
+    exact_rows = set(data["row"][keep])
+    streamed_rows = set(pd.read_csv(tmp_path / "filtered.csv")["row"])
+
+    assert report["rows_kept"] == len(streamed_rows)
+    assert len(exact_rows ^ streamed_rows) <= report["uncertain_rows"]
+    assert report["uncertain_share"] <= 1.0
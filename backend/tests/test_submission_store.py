@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.submission_store import SubmissionStore, WriteBehindQueue, WriteQueueFull
+
+@pytest.fixture
+def store(tmp_path):
+    store = SubmissionStore(str(tmp_path / "submissions.db"))
+    store.open()
+    yield store
+    store.close()
+
+# Concurrent writes share one transaction and each caller gets its own row id
+def test_writes_are_group_committed(store):
+    writer = WriteBehindQueue(store, max_delay=0.05)
+
+    async def main():
+        writer.start()
+        ids = await asyncio.gather(*(writer.write("contact_messages", f"user{i}@example.com", {"message": str(i)})
+                                     for i in range(20)))
+        await writer.close()
+        return ids
+
+    ids = asyncio.run(main())
+    assert len(set(ids)) == 20
+    assert writer.stats()["batches"] == 1
+    assert writer.stats()["rows"] == 20
+    assert len(store.query("contact_messages", limit=100)["items"]) == 20
+
+# Rows still waiting for their batch when the app shuts down are committed by close()
+def test_close_flushes_pending_rows(store):
+    writer = WriteBehindQueue(store, max_delay=60.0)
+
+    async def main():
+        writer.start()
+        writes = [asyncio.ensure_future(writer.write("health_reports", "a@example.com", {"n": i})) for i in range(5)]
+        await asyncio.sleep(0.05)
+        assert not any(write.done() for write in writes)
+        await asyncio.wait_for(writer.close(), 5)
+        return await asyncio.gather(*writes)
+
+    assert len(asyncio.run(main())) == 5
+    items = store.query("health_reports", email="a@example.com")["items"]
+    assert sorted(item["n"] for item in items) == list(range(5))
+
+def test_full_queue_rejects_writes(store):
+    writer = WriteBehindQueue(store, max_batch=1, max_pending=1, enqueue_timeout=0.01)
+    release = threading.Event()
+    insert_many = store.insert_many
+    store.insert_many = lambda rows: release.wait(5) and insert_many(rows)
+
+    async def main():
+        writer.start()
+        # The writer is stuck committing the first row and the second fills the queue
+        writes = [asyncio.ensure_future(writer.write("contact_messages", "a@example.com", {})) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(WriteQueueFull):
+            await writer.write("contact_messages", "a@example.com", {})
+        release.set()
+        await writer.close()
+        await asyncio.gather(*writes)
+
+    asyncio.run(main())
+    assert writer.stats()["rejected"] == 1
+    assert writer.stats()["rows"] == 2
+
+# Pages follow each other newest first without gaps or repeats
+def test_query_pages(store):
+    store.insert_many([("contact_messages", 100.0 + i % 3, "a@example.com", {"n": i}) for i in range(10)])
+    seen = []
+    cursor = None
+    while True:
+        page = store.query("contact_messages", cursor=cursor, limit=4)
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(item["n"] for item in seen) == list(range(10))
+    keys = [(item["submitted_at"], item["id"]) for item in seen]
+    assert keys == sorted(keys, reverse=True)
+    with pytest.raises(ValueError):
+        store.query("users")
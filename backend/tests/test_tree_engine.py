@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.multioutput import MultiOutputRegressor
+
+from utils.tree_engine import ROW_CHUNK_SIZE, CompiledForest
+
+# Leaf averages are summed in a different order than sklearn, so allow float rounding only
+TOLERANCE = 1e-9
+
+def make_data(n_rows=400, n_features=6, n_outputs=3, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    y = np.column_stack([X @ rng.normal(size=n_features) + np.sin(X[:, i]) for i in range(n_outputs)])
+    return X, y
+
+@pytest.fixture(scope="module", params=["native", "multioutput"])
+def model_and_data(request):
+    X, y = make_data()
+    forest = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0)
+    model = forest if request.param == "native" else MultiOutputRegressor(forest)
+    return model.fit(X, y), X
+
+def test_matches_sklearn(model_and_data):
+    model, X = model_and_data
+    X_test, _ = make_data(n_rows=500, seed=1)
+    compiled = CompiledForest.from_model(model)
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict(X_test), rtol=0, atol=TOLERANCE)
+    assert compiled.max_deviation(model, X_test) <= TOLERANCE
+
+def test_selected_outputs(model_and_data):
+    model, X = model_and_data
+    expected = model.predict(X[:50])
+    compiled = CompiledForest.from_model(model, outputs=[2, 0])
+    np.testing.assert_allclose(compiled.predict(X[:50]), expected[:, [2, 0]], rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(compiled.predict(X[:50], outputs=[0]), expected[:, [0]], rtol=0, atol=TOLERANCE)
+
+def test_single_row_and_round_trip(model_and_data):
+    model, X = model_and_data
+    compiled = CompiledForest.from_model(model)
+    arrays, metadata = compiled.to_arrays()
+    restored = CompiledForest.from_arrays(arrays, metadata)
+    np.testing.assert_allclose(restored.predict(X[0]), model.predict(X[:1]), rtol=0, atol=TOLERANCE)
+
+# Batches spanning several row chunks, including a partial last one
+def test_large_batches(model_and_data):
+    model, _ = model_and_data
+    X_test, _ = make_data(n_rows=ROW_CHUNK_SIZE * 3 + 17, seed=2)
+    compiled = CompiledForest.from_model(model)
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict(X_test), rtol=0, atol=TOLERANCE)
+
+def test_rejects_other_models():
+    X, y = make_data(n_outputs=1)
+    with pytest.raises(TypeError):
+        CompiledForest.from_model(Ridge().fit(X, y.ravel()))
@@ -1,83 +1,107 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.preprocessing import StandardScaler
+import argparse
 import joblib
 import os
 
+from streaming_preprocess import DEFAULT_CHUNKSIZE, DEFAULT_SKETCH_K, print_filter_report, stream_iqr_filter
+from training_common import SEARCH_METHODS, StageTimer, cached_cv_folds, make_search, next_version, publish_version
+
+# Default locations, relative to the backend directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_PATH = os.path.join(BACKEND_DIR, "data", "aqhealth_merged.csv")
+DEFAULT_MODELS_DIR = os.path.join(BACKEND_DIR, "models")
+
+# Where the cleaned data is saved: next to the input file unless output_dir is given
+def cleaned_path(filepath, output_dir=None):
+    # Specify the directory where you want to save the cleaned data
+    target_dir = output_dir or os.path.dirname(os.path.abspath(filepath))
+
+    # Create the cleaned filepath using the specified target directory
+    return os.path.join(target_dir, os.path.basename(filepath).replace(".csv", "_cleaned.csv"))
+
 # Data cleaning + IQR removing outliers
-def load_and_preprocess_data(filepath):
+def load_and_preprocess_data(filepath, output_dir=None):
     data = pd.read_csv(filepath, thousands=',')
     data.dropna(inplace=True)
-    
+
     numeric_cols = data.select_dtypes(include=[np.number]).columns
     Q1 = data[numeric_cols].quantile(0.25)
     Q3 = data[numeric_cols].quantile(0.75)
     IQR = Q3 - Q1
     data = data[~((data[numeric_cols] < (Q1 - 1.5 * IQR)) | (data[numeric_cols] > (Q3 + 1.5 * IQR))).any(axis=1)]
-    
-    # Specify the directory where you want to save the cleaned data
-    target_dir = "C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//data"
-    
-    # Create the cleaned filepath using the specified target directory
-    cleaned_filepath = os.path.join(target_dir, os.path.basename(filepath).replace(".csv", "_cleaned.csv"))
-    
-    data.to_csv(cleaned_filepath, index=False)
+
+    data.to_csv(cleaned_path(filepath, output_dir), index=False)
     return data
 
-def model_random_forest_health(data):
+# Same cleaning for files too large for memory: two passes over chunks, with Q1/Q3 estimated
+# by a quantile sketch. Prints how many rows might differ from the exact filter above.
+def stream_preprocess_data(filepath, output_dir=None, chunksize=DEFAULT_CHUNKSIZE, sketch_k=DEFAULT_SKETCH_K):
+    cleaned_filepath = cleaned_path(filepath, output_dir)
+    report = stream_iqr_filter(filepath, cleaned_filepath, chunksize=chunksize, sketch_k=sketch_k, thousands=',')
+    print_filter_report(report)
+    return cleaned_filepath
+
+def model_random_forest_health(data, n_jobs=-1, search_method="grid", cv=3, timer=None):
+    timer = timer or StageTimer()
+
     # Combine targets into a single DataFrame
     health_variables = ['All respiratory deaths', 'Bronchiectasis', 'COPD']
-    X = data[['London Mean Roadside:Nitrogen Dioxide (ug/m3)', 
-               'London Mean Roadside:PM10 Particulate (ug/m3)', 
-               'London Mean Roadside:PM2.5 Particulate (ug/m3)', 
-               'London Mean Roadside:Ozone (ug/m3)', 
-               'London Mean Roadside:Sulphur Dioxide (ug/m3)', 
-               'London Mean Background:Nitrogen Dioxide (ug/m3)', 
-               'London Mean Background:Ozone (ug/m3)', 
-               'London Mean Background:PM10 Particulate (ug/m3)', 
-               'London Mean Background:PM2.5 Particulate (ug/m3)', 
+    X = data[['London Mean Roadside:Nitrogen Dioxide (ug/m3)',
+               'London Mean Roadside:PM10 Particulate (ug/m3)',
+               'London Mean Roadside:PM2.5 Particulate (ug/m3)',
+               'London Mean Roadside:Ozone (ug/m3)',
+               'London Mean Roadside:Sulphur Dioxide (ug/m3)',
+               'London Mean Background:Nitrogen Dioxide (ug/m3)',
+               'London Mean Background:Ozone (ug/m3)',
+               'London Mean Background:PM10 Particulate (ug/m3)',
+               'London Mean Background:PM2.5 Particulate (ug/m3)',
                'London Mean Background:Sulphur Dioxide (ug/m3)']]
-    
+
     y = data[health_variables]
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    with timer.stage("split and scale"):
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
 
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+        # Same CV splits for every candidate
+        folds = cached_cv_folds(X_train_scaled, n_splits=cv)
 
-    # Using MultiOutputRegressor for multiple outputs
+    # RandomForestRegressor handles all three targets natively, so each candidate
+    # trains one forest instead of one forest per target
     rf_model = RandomForestRegressor(random_state=42)
-    multi_target_model = MultiOutputRegressor(rf_model)
 
     rf_param_grid = {
-        'estimator__n_estimators': [50, 100],  # Reduced for quicker testing
-        'estimator__max_depth': [None, 10],
-        'estimator__min_samples_split': [2, 5]
+        'n_estimators': [50, 100],  # Reduced for quicker testing
+        'max_depth': [None, 10],
+        'min_samples_split': [2, 5]
     }
-    
+
     try:
-        rf_grid_search = GridSearchCV(multi_target_model, rf_param_grid, cv=3, 
-                                       scoring='neg_mean_squared_error', n_jobs=-1, verbose=2)
-        rf_grid_search.fit(X_train_scaled, y_train)
-        best_rf_params = rf_grid_search.best_params_
+        with timer.stage(f"{search_method} search"):
+            rf_grid_search = make_search(rf_model, rf_param_grid, folds, method=search_method,
+                                         n_jobs=n_jobs, verbose=2)
+            rf_grid_search.fit(X_train_scaled, y_train)
+        print("Best Random Forest parameters:", rf_grid_search.best_params_)
 
-        # Fit the best model
-        best_rf_model = RandomForestRegressor(**{k.split('__')[1]: v for k, v in best_rf_params.items()}, random_state=42)
-        final_model = MultiOutputRegressor(best_rf_model)
-        final_model.fit(X_train_scaled, y_train)
+        # The search has already refit the best model on the whole training set
+        final_model = rf_grid_search.best_estimator_
 
         # Make predictions
-        y_pred = final_model.predict(X_test_scaled)
+        with timer.stage("evaluate"):
+            y_pred = final_model.predict(X_test_scaled)
+
+            # Print metrics for each health outcome
+            for i, variable in enumerate(health_variables):
+                print_metrics(y_test.iloc[:, i], y_pred[:, i], variable)
 
-        # Print metrics for each health outcome
-        for i, variable in enumerate(health_variables):
-            print_metrics(y_test.iloc[:, i], y_pred[:, i], variable)
-        
         return y_test, y_pred, final_model, scaler
     except Exception as e:
         print("Error during model training:", str(e))
@@ -88,32 +112,63 @@ def print_metrics(y_test, y_pred, variable_name):
     r2 = r2_score(y_test, y_pred)
     mae = mean_absolute_error(y_test, y_pred)
     rmse = np.sqrt(mse)
-    
+
     print(f'Random Forest - {variable_name} Metrics:')
     print(f'MSE: {mse:.4f}, R²: {r2:.4f}, MAE: {mae:.4f}, RMSE: {rmse:.4f}')
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the air quality -> health Random Forest model")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="raw merged air quality/health CSV")
+    parser.add_argument("--models-dir", default=DEFAULT_MODELS_DIR, help="where the model and scaler are saved")
+    parser.add_argument("--version", default=None,
+                        help="name of the published model version (default: the next v<n> in --models-dir)")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel jobs for the search (-1 = all cores)")
+    parser.add_argument("--search", choices=SEARCH_METHODS, default="grid", help="exhaustive grid or successive halving")
+    parser.add_argument("--cv", type=int, default=3, help="number of cross-validation folds")
+    parser.add_argument("--streaming", action="store_true",
+                        help="clean the data in chunks with approximate quartiles (bounded memory)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk with --streaming")
+    parser.add_argument("--sketch-k", type=int, default=DEFAULT_SKETCH_K,
+                        help="quantile sketch size with --streaming; larger is more accurate")
+    parser.add_argument("--preprocess-only", action="store_true", help="write the cleaned CSV and stop")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    filepath = "C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//data//aqhealth_merged.csv"
+    args = parse_args()
+    timer = StageTimer()
+
+    with timer.stage("load and preprocess"):
+        if args.streaming:
+            cleaned_filepath = stream_preprocess_data(args.data, chunksize=args.chunksize, sketch_k=args.sketch_k)
+        else:
+            data = load_and_preprocess_data(args.data)
+    if args.preprocess_only:
+        timer.report()
+        raise SystemExit(0)
+
+    # Only the cleaned rows are loaded for training
+    if args.streaming:
+        with timer.stage("load cleaned data"):
+            data = pd.read_csv(cleaned_filepath)
+
+    output_models_dir = args.models_dir
 
-    data = load_and_preprocess_data(filepath)
-    
-    output_models_dir = "C://Users//User//OneDrive//Desktop//COS30049 Computing Technology Innovation Project//Assignment 3//models"
-    
     # Make sure directories exist
     os.makedirs(output_models_dir, exist_ok=True)
 
     # Random Forest Modeling
-    y_test, y_pred, final_model, scaler = model_random_forest_health(data)
+    y_test, y_pred, final_model, scaler = model_random_forest_health(
+        data, n_jobs=args.jobs, search_method=args.search, cv=args.cv, timer=timer)
 
-    # Save the final model and the scaler separately
+    # Save the final model and the scaler separately, as a new version the server picks up
     if final_model and scaler:
-        model_path = os.path.join(output_models_dir, 'aq_health_regression.pkl')
-        scaler_path = os.path.join(output_models_dir, 'scaler_health.pkl')
-        
-        joblib.dump(final_model, model_path)
-        joblib.dump(scaler, scaler_path)
-        
-        print(f"Model saved at {model_path}")
-        print(f"Scaler saved at {scaler_path}")
+        version = args.version or next_version(output_models_dir)
+        with timer.stage("save"), publish_version(output_models_dir, version) as version_path:
+            joblib.dump(final_model, os.path.join(version_path, 'aq_health_regression.pkl'))
+            joblib.dump(scaler, os.path.join(version_path, 'scaler_health.pkl'))
+
+        print(f"Model version {version} saved in {os.path.join(output_models_dir, version)}")
     else:
-        print("Model or scaler could not be saved due to an issue during training.")
\ No newline at end of file
+        print("Model or scaler could not be saved due to an issue during training.")
+
+    timer.report()
@@ -1,14 +1,40 @@
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import Ridge
-from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import matplotlib.pyplot as plt
+import argparse
 import joblib
 import os
 
+from incremental_ridge import IncrementalRidge
+from training_common import (SEARCH_METHODS, StageTimer, cached_cv_folds, latest_version_path, make_search,
+                             next_version, publish_version)
+
+# Default locations, relative to the backend directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_PATH = os.path.join(BACKEND_DIR, "data", "merged_weather_air_quality_cleaned_renamed.csv")
+DEFAULT_MODELS_DIR = os.path.join(BACKEND_DIR, "models")
+
+# Define feature columns based on available data
+FEATURE_COLUMNS = ['mean_temp', 'wspd', 'wdir', 'precipitation', 'pressure',
+                   'Roadside_Nitrogen_Dioxide (ug/m3)', 'Roadside_Ozone (ug/m3)',
+                   'Roadside_PM10_Particulate (ug/m3)', 'Roadside_PM2.5_Particulate (ug/m3)',
+                   'Background_Nitrogen_Dioxide (ug/m3)', 'Background_Ozone (ug/m3)',
+                   'Background_PM10_Particulate (ug/m3)', 'Background_PM2.5_Particulate (ug/m3)']
+
+# Define targets for multi-output
+TARGET_COLUMNS = ['Roadside_PM2.5_Particulate (ug/m3)', 'Background_Nitrogen_Dioxide (ug/m3)', 'Roadside_Ozone (ug/m3)']
+
+ALPHAS = np.logspace(-3, 3, 7)
+
+# Sufficient statistics of the training rows, used by --update
+STATS_FILENAME = 'weather_ridge_stats.npz'
+
+MODEL_FILENAME = 'aq_weather_regression.pkl'
+SCALER_FILENAME = 'scaler_weather.pkl'
+
 # Load and preprocess data
 def load_and_preprocess_data(filepath):
     data = pd.read_csv(filepath)
@@ -33,7 +59,10 @@ def print_metrics(y_true, y_pred, target_name):
     print(f"{target_name} - MSE: {mse:.4f}, RMSE: {rmse:.4f}, MAE: {mae:.4f}, R²: {r2:.4f}")
 
 # Plot residuals
+# matplotlib is only imported when plots are wanted, so headless retraining doesn't need it
 def plot_residuals(y_true, y_pred, target_name):
+    import matplotlib.pyplot as plt
+
     residuals = y_true - y_pred
     plt.figure(figsize=(8, 6))
     plt.scatter(y_pred, residuals, alpha=0.5)
@@ -44,65 +73,124 @@ def plot_residuals(y_true, y_pred, target_name):
     plt.show()
 
 # Ridge Regression model function for multi-output
-def model_ridge_regression_multioutput(data, models_path):
-    # Define feature columns based on available data
-    X = data[['mean_temp', 'wspd', 'wdir', 'precipitation', 'pressure',
-              'Roadside_Nitrogen_Dioxide (ug/m3)', 'Roadside_Ozone (ug/m3)',       
-              'Roadside_PM10_Particulate (ug/m3)', 'Roadside_PM2.5_Particulate (ug/m3)',
-              'Background_Nitrogen_Dioxide (ug/m3)', 'Background_Ozone (ug/m3)',   
-              'Background_PM10_Particulate (ug/m3)', 'Background_PM2.5_Particulate (ug/m3)']]
-    
-    # Define targets for multi-output
-    y = data[['Roadside_PM2.5_Particulate (ug/m3)', 'Background_Nitrogen_Dioxide (ug/m3)', 'Roadside_Ozone (ug/m3)']]
+# Ridge fits all targets in one solve, so no MultiOutputRegressor wrapper is needed
+# The model is published as a new version in models_path (default name: the next v<n>)
+def model_ridge_regression_multioutput(data, models_path, n_jobs=-1, search_method="grid", cv=5,
+                                       plots=True, timer=None, version=None):
+    timer = timer or StageTimer()
 
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X = data[FEATURE_COLUMNS]
+    y = data[TARGET_COLUMNS]
 
-    # Standardize the data
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    with timer.stage("split and scale"):
+        # Split the data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # Hyperparameter tuning with GridSearchCV on Ridge
-    param_grid = {'estimator__alpha': np.logspace(-3, 3, 7)}
-    ridge_model = MultiOutputRegressor(Ridge())
-    grid_search = GridSearchCV(ridge_model, param_grid, cv=5, scoring='neg_mean_squared_error')
-    grid_search.fit(X_train_scaled, y_train)
+        # Standardize the data
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+        # Same CV splits for every alpha
+        folds = cached_cv_folds(X_train_scaled, n_splits=cv)
+
+    # Hyperparameter tuning on Ridge
+    param_grid = {'alpha': ALPHAS}
+    with timer.stage(f"{search_method} search"):
+        grid_search = make_search(Ridge(), param_grid, folds, method=search_method, n_jobs=n_jobs)
+        grid_search.fit(X_train_scaled, y_train)
 
     # Retrieve the best model and its parameters
+    # The search has already refit it on the whole training set
     best_model = grid_search.best_estimator_
-    best_alpha = grid_search.best_params_['estimator__alpha']
+    best_alpha = grid_search.best_params_['alpha']
     print(f'Best Alpha for Multi-Output Ridge Regression: {best_alpha}')
 
-    # Fit the best model
-    best_model.fit(X_train_scaled, y_train)
-    y_pred = best_model.predict(X_test_scaled)
+    with timer.stage("evaluate"):
+        y_pred = best_model.predict(X_test_scaled)
+
+        # Evaluate metrics for each target variable
+        for i, target_name in enumerate(y.columns):
+            print_metrics(y_test.iloc[:, i], y_pred[:, i], target_name)
 
-    # Evaluate metrics for each target variable
-    for i, target_name in enumerate(y.columns):
-        print_metrics(y_test.iloc[:, i], y_pred[:, i], target_name)
-        plot_residuals(y_test.iloc[:, i], y_pred[:, i], target_name)
+    if plots:
+        for i, target_name in enumerate(y.columns):
+            plot_residuals(y_test.iloc[:, i], y_pred[:, i], target_name)
 
     # Save the model and scaler separately
-    model_path = os.path.join(models_path, 'aq_weather_regression.pkl')
-    scaler_path = os.path.join(models_path, 'scaler_weather.pkl')
-    
-    joblib.dump(best_model, model_path)
-    joblib.dump(scaler, scaler_path)
-    
-    print(f"Model saved at {model_path}")
-    print(f"Scaler saved at {scaler_path}")
+    version = version or next_version(models_path)
+    with timer.stage("save"), publish_version(models_path, version) as version_path:
+        joblib.dump(best_model, os.path.join(version_path, MODEL_FILENAME))
+        joblib.dump(scaler, os.path.join(version_path, SCALER_FILENAME))
+
+        # Keep the training statistics so new months can be added without a full retrain
+        stats = IncrementalRidge(FEATURE_COLUMNS, TARGET_COLUMNS).partial_fit(X_train, y_train)
+        stats.save(os.path.join(version_path, STATS_FILENAME))
+
+    print(f"Model version {version} saved in {os.path.join(models_path, version)}")
+
+# Add new rows to the stored statistics and re-solve, instead of rerunning the grid search
+# The statistics of the newest version are updated and saved with the result as a new version
+# alpha=None re-selects alpha over ALPHAS by generalized cross-validation
+def update_ridge_regression(new_data, models_path, alpha=None, timer=None, version=None):
+    timer = timer or StageTimer()
+    latest_path = latest_version_path(models_path, MODEL_FILENAME, SCALER_FILENAME)
+    stats_path = os.path.join(latest_path or models_path, STATS_FILENAME)
+    if not os.path.exists(stats_path):
+        raise FileNotFoundError(f"{stats_path} not found; run a full training first")
+
+    with timer.stage("update statistics"):
+        stats = IncrementalRidge.load(stats_path)
+        stats.partial_fit(new_data[FEATURE_COLUMNS], new_data[TARGET_COLUMNS])
+    print(f"Added {len(new_data)} rows, {stats.n_samples} rows in total")
+
+    with timer.stage("solve"):
+        if alpha is None:
+            alpha, _ = stats.select_alpha(ALPHAS)
+        model, scaler = stats.to_sklearn(alpha)
+    print(f'Alpha for Multi-Output Ridge Regression: {alpha}')
+
+    version = version or next_version(models_path)
+    with timer.stage("save"), publish_version(models_path, version) as version_path:
+        joblib.dump(model, os.path.join(version_path, MODEL_FILENAME))
+        joblib.dump(scaler, os.path.join(version_path, SCALER_FILENAME))
+        stats.save(os.path.join(version_path, STATS_FILENAME))
+
+    print(f"Model version {version} saved in {os.path.join(models_path, version)}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the weather -> air quality Ridge model")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="cleaned merged weather/air quality CSV")
+    parser.add_argument("--models-dir", default=DEFAULT_MODELS_DIR, help="where the model and scaler are saved")
+    parser.add_argument("--version", default=None,
+                        help="name of the published model version (default: the next v<n> in --models-dir)")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel jobs for the search (-1 = all cores)")
+    parser.add_argument("--search", choices=SEARCH_METHODS, default="grid", help="exhaustive grid or successive halving")
+    parser.add_argument("--cv", type=int, default=5, help="number of cross-validation folds")
+    parser.add_argument("--no-plots", action="store_true", help="skip the residual plots")
+    parser.add_argument("--update", metavar="NEW_CSV",
+                        help="add the rows of NEW_CSV to the saved statistics instead of retraining")
+    parser.add_argument("--alpha", type=float, default=None,
+                        help="fixed alpha for --update (default: choose by generalized cross-validation)")
+    return parser.parse_args()
 
 # Main execution
 if __name__ == "__main__":
-    filepath = "C:\\Users\\User\\OneDrive\\Desktop\\COS30049 Computing Technology Innovation Project\\Assignment 3\\data\\merged_weather_air_quality_cleaned_renamed.csv"
-    models_path = "C:\\Users\\User\\OneDrive\\Desktop\\COS30049 Computing Technology Innovation Project\\Assignment 3\\models"
+    args = parse_args()
+    timer = StageTimer()
 
     # Ensure models_path exists
-    os.makedirs(models_path, exist_ok=True)
+    os.makedirs(args.models_dir, exist_ok=True)
 
     # Load and preprocess data
-    data = load_and_preprocess_data(filepath)
+    with timer.stage("load and preprocess"):
+        data = load_and_preprocess_data(args.update or args.data)
     
-    # Train multi-output model and save it
-    model_ridge_regression_multioutput(data, models_path)
\ No newline at end of file
+    if args.update:
+        update_ridge_regression(data, args.models_dir, alpha=args.alpha, timer=timer, version=args.version)
+    else:
+        # Train multi-output model and save it
+        model_ridge_regression_multioutput(data, args.models_dir, n_jobs=args.jobs, search_method=args.search,
+                                           cv=args.cv, plots=not args.no_plots, timer=timer, version=args.version)
+
+    timer.report()
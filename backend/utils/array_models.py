@@ -0,0 +1,74 @@
+import numpy as np
+
+# Array-only stand-ins for the fitted sklearn objects the service loads
+#
+# Both expose the small part of the sklearn API that predict_batch and
+# check_manifest use, and round-trip through to_arrays() / from_arrays(), so a
+# model version can be served from memory-mapped arrays without unpickling
+# anything or importing sklearn. Their results match the originals up to rounding.
+
+# StandardScaler.transform as (X - mean) / scale
+class ArrayScaler:
+    def __init__(self, mean, scale, feature_names=None):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.n_features_in_ = len(mean)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        if not hasattr(scaler, "scale_") or not hasattr(scaler, "mean_"):
+            raise TypeError(f"Cannot convert scaler of type {type(scaler).__name__}; expected a StandardScaler.")
+        n_features = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        feature_names = getattr(scaler, "feature_names_in_", None)
+        return cls(np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64),
+                   None if feature_names is None else list(feature_names))
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+    def to_arrays(self):
+        feature_names = getattr(self, "feature_names_in_", None)
+        return ({"mean": self.mean_, "scale": self.scale_},
+                {"feature_names": None if feature_names is None else list(feature_names)})
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        return cls(arrays["mean"], arrays["scale"], metadata.get("feature_names"))
+
+# Linear regression with one row of coefficients per output: X @ coef.T + intercept
+# Converts a linear model (Ridge, LinearRegression, ...) or a MultiOutputRegressor of them
+class LinearModel:
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+        self.n_features_in_ = coef.shape[1]
+
+    @classmethod
+    def from_model(cls, model):
+        estimators = getattr(model, "estimators_", None)
+        if estimators is not None and all(hasattr(estimator, "coef_") for estimator in estimators):
+            coef = np.vstack([np.reshape(estimator.coef_, (1, -1)) for estimator in estimators])
+            intercept = np.array([np.ravel(estimator.intercept_)[0] for estimator in estimators])
+        elif hasattr(model, "coef_"):
+            coef = np.atleast_2d(model.coef_)
+            intercept = np.broadcast_to(np.ravel(model.intercept_), (coef.shape[0],))
+        else:
+            raise TypeError(f"Cannot convert model of type {type(model).__name__}; expected a linear model.")
+        return cls(np.ascontiguousarray(coef, dtype=np.float64), np.ascontiguousarray(intercept, dtype=np.float64))
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef.T + self.intercept
+
+    def to_arrays(self):
+        return {"coef": self.coef, "intercept": self.intercept}, {}
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        return cls(arrays["coef"], arrays["intercept"])
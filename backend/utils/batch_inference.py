@@ -0,0 +1,34 @@
+import numpy as np
+
+from utils.metrics import null_timer
+from utils.tree_engine import CompiledForest
+
+# Scale and predict a whole (rows x features) matrix in a single call
+# If output is given, only that output column is returned
+# timer(stage) returns a context manager used to time the "scale" and "predict" stages
+def predict_batch(model, scaler, features, output=None, timer=null_timer):
+    features = np.asarray(features, dtype=np.float64)
+    if features.ndim == 1 and features.size > 0:
+        features = features.reshape(1, -1)
+
+    if features.size == 0:
+        return np.empty(0) if output is not None else np.empty((0, 0))
+
+    with timer("scale"):
+        features_scaled = scaler.transform(features)
+    return predict_scaled(model, features_scaled, output, timer)
+
+# Predict an already scaled (rows x features) matrix; see predict_batch
+def predict_scaled(model, features_scaled, output=None, timer=null_timer):
+    # Compiled forests can skip the trees of outputs nobody asked for
+    if output is not None and isinstance(model, CompiledForest):
+        with timer("predict"):
+            return model.predict(features_scaled, outputs=[output])[:, 0]
+
+    with timer("predict"):
+        predictions = np.asarray(model.predict(features_scaled))
+    predictions = predictions.reshape(features_scaled.shape[0], -1)
+
+    if output is not None:
+        return predictions[:, output]
+    return predictions
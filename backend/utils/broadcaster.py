@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+# Event serialized once and shared by every subscriber
+class BroadcastEvent:
+    def __init__(self, data, event_id=None):
+        self.data = data
+        self.event_id = event_id
+        self.published_at = time.perf_counter()
+
+# Per-client queue of pending events
+class Subscription:
+    def __init__(self, broadcaster, max_queue):
+        self.broadcaster = broadcaster
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+
+    # Next event, or None after timeout seconds (used for keep-alives) or once the client was dropped
+    async def next(self, timeout=None):
+        if self.closed and self.queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+# Fans each published event out to every subscriber without waiting for any of them
+#
+# Every subscriber has a bounded queue. A slow consumer whose queue is full
+# loses its oldest pending event (the newest prediction is the one that
+# matters); one that has lost max_dropped events in a row is disconnected,
+# so a stuck client costs a fixed amount of memory and never slows publish().
+class Broadcaster:
+    def __init__(self, max_queue=4, max_dropped=16):
+        self.max_queue = max_queue
+        self.max_dropped = max_dropped
+        self.subscribers = set()
+        self.published = 0
+        self.dropped_events = 0
+        self.disconnected_slow = 0
+        self.last_event = None
+
+    def subscribe(self):
+        subscription = Subscription(self, self.max_queue)
+        # New clients get the latest event right away
+        if self.last_event is not None:
+            subscription.queue.put_nowait(self.last_event)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        self.subscribers.discard(subscription)
+
+    # Must be called on the event loop thread
+    def publish(self, data, event_id=None):
+        event = BroadcastEvent(data, event_id)
+        self.last_event = event
+        self.published += 1
+        for subscription in list(self.subscribers):
+            if subscription.queue.full():
+                subscription.queue.get_nowait()
+                subscription.dropped += 1
+                self.dropped_events += 1
+                if subscription.dropped >= self.max_dropped:
+                    self.disconnected_slow += 1
+                    self.unsubscribe(subscription)
+                    continue
+            else:
+                subscription.dropped = 0
+            subscription.queue.put_nowait(event)
+        return event
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped_events": self.dropped_events,
+            "disconnected_slow": self.disconnected_slow,
+        }
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+DATE_FILE = "date.npy"
+STORE_FORMAT_VERSION = 1
+
+# Default datasets converted by the command line tool
+DEFAULT_DATASETS = ["aqhealth_merged_cleaned.csv", "merged_weather_air_quality_cleaned_renamed.csv"]
+
+# Typed columnar copy of a dataset, one .npy file per column
+#
+# Rows are sorted by date and the dates are kept as a datetime64[s] index, so
+# a date range is a contiguous slice. Opened stores are memory-mapped: opening
+# reads only the manifest, pages are loaded when a column is touched, and
+# rows()/between() return views of the mapped files without copying.
+class ColumnStore:
+    def __init__(self, columns, dates=None, date_column="date"):
+        self._columns = dict(columns)
+        self.dates = dates
+        self.date_column = date_column
+        lengths = {len(values) for values in self._columns.values()}
+        if dates is not None:
+            lengths.add(len(dates))
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else 0
+
+    # Build an in-memory store from a DataFrame, sorted by date
+    @classmethod
+    def from_frame(cls, data, date_column="date", date_format=None):
+        import pandas as pd
+
+        dates = None
+        order = np.arange(len(data))
+        if date_column in data.columns:
+            dates = pd.to_datetime(data[date_column], format=date_format).to_numpy().astype("datetime64[s]")
+            order = np.argsort(dates, kind="stable")
+            dates = dates[order]
+
+        columns = {}
+        for name in data.columns:
+            if name == date_column:
+                continue
+            values = data[name].to_numpy()[order]
+            if values.dtype == object:
+                values = values.astype(str)
+            columns[name] = np.ascontiguousarray(values)
+        return cls(columns, dates, date_column)
+
+    # Memory-map a store written by write()
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        manifest = read_manifest(path)
+        if manifest.get("format") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported column store format in {path}: {manifest.get('format')}")
+
+        columns = {column["name"]: np.load(os.path.join(path, column["file"]), mmap_mode=mmap_mode)
+                   for column in manifest["columns"]}
+        dates = None
+        if manifest.get("date_column") is not None:
+            dates = np.load(os.path.join(path, DATE_FILE), mmap_mode=mmap_mode)
+        return cls(columns, dates, manifest.get("date_column") or "date")
+
+    # Write every column to path; the directory is replaced in one rename
+    def write(self, path, source=None):
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        manifest = {
+            "format": STORE_FORMAT_VERSION,
+            "rows": len(self),
+            "date_column": self.date_column if self.dates is not None else None,
+            "columns": [],
+            "source": source,
+        }
+        for i, (name, values) in enumerate(self._columns.items()):
+            filename = f"c{i:03d}.npy"
+            np.save(os.path.join(tmp_path, filename), np.ascontiguousarray(values))
+            manifest["columns"].append({"name": name, "file": filename, "dtype": str(values.dtype)})
+        if self.dates is not None:
+            np.save(os.path.join(tmp_path, DATE_FILE), np.ascontiguousarray(self.dates, dtype="datetime64[s]"))
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        old_path = path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def column(self, name):
+        if name not in self._columns:
+            raise KeyError(f"Column '{name}' is not in the store")
+        return self._columns[name]
+
+    # Rows start..stop of every column, as views
+    def rows(self, start=None, stop=None):
+        index = slice(start, stop)
+        dates = self.dates[index] if self.dates is not None else None
+        return ColumnStore({name: values[index] for name, values in self._columns.items()}, dates, self.date_column)
+
+    # Rows with start <= date < end (either bound may be None), as views
+    def between(self, start=None, end=None):
+        if self.dates is None:
+            raise ValueError("Store has no date index")
+        first = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "s"), side="left"))
+        last = len(self) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "s"), side="left"))
+        return self.rows(first, max(first, last))
+
+    # Calendar years and months (1-12) of every row
+    def years(self):
+        return self.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+
+    def months(self):
+        return self.dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+
+    # Materialize the store (or some columns) as a DataFrame; this copies
+    def to_frame(self, columns=None):
+        import pandas as pd
+
+        data = {name: np.asarray(self.column(name)) for name in (columns or self.columns)}
+        frame = pd.DataFrame(data)
+        if self.dates is not None:
+            frame.insert(0, self.date_column, np.asarray(self.dates))
+        return frame
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+# Size and modification time of a file, recorded so stale stores can be detected
+def source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"file": os.path.basename(csv_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+# True if the store at path exists and was built from the current version of csv_path
+def store_is_current(path, csv_path):
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return read_manifest(path).get("source") == source_signature(csv_path)
+
+# Directory of the store for a CSV: DATA_DIR/store/<csv name without extension>
+def store_path_for(data_dir, csv_file):
+    return os.path.join(data_dir, "store", os.path.splitext(csv_file)[0])
+
+def convert_csv(csv_path, store_path, date_column="date", date_format=None):
+    import pandas as pd
+
+    store = ColumnStore.from_frame(pd.read_csv(csv_path), date_column=date_column, date_format=date_format)
+    store.write(store_path, source=source_signature(csv_path))
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the serving datasets into memory-mapped column stores")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+    parser.add_argument("--date-format", default=None, help="strftime format of the date column (default: inferred)")
+    parser.add_argument("files", nargs="*", default=DEFAULT_DATASETS, help="CSV files in the data directory")
+    args = parser.parse_args()
+
+    for csv_file in args.files:
+        csv_path = os.path.join(args.data_dir, csv_file)
+        store_path = store_path_for(args.data_dir, csv_file)
+        store = convert_csv(csv_path, store_path, date_format=args.date_format)
+        print(f"{csv_file}: {len(store)} rows, {len(store.columns)} columns -> {store_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Contiguous float matrix of model features, built once from a dataset
+#
+# Columns follow a manifest (feature_names) that is checked against the
+# scaler the model was trained with, so rows can be fed straight into
+# scaler.transform without any per-request pandas indexing.
+class FeatureMatrix:
+    def __init__(self, values, feature_names):
+        self.values = values
+        self.feature_names = list(feature_names)
+
+    # Build the matrix from a DataFrame in manifest order
+    @classmethod
+    def from_frame(cls, data, feature_names, scaler=None):
+        check_manifest(feature_names, scaler)
+
+        missing = [col for col in feature_names if col not in data.columns]
+        if missing:
+            raise ValueError(f"Dataset is missing feature columns: {missing}")
+
+        values = np.ascontiguousarray(data[feature_names].to_numpy(dtype=np.float64))
+        return cls(values, feature_names)
+
+    # Build the matrix from the columns of a ColumnStore; only the feature columns are read
+    @classmethod
+    def from_store(cls, store, feature_names, scaler=None):
+        check_manifest(feature_names, scaler)
+
+        missing = [col for col in feature_names if col not in store]
+        if missing:
+            raise ValueError(f"Dataset is missing feature columns: {missing}")
+
+        values = np.empty((len(store), len(feature_names)), dtype=np.float64)
+        for i, name in enumerate(feature_names):
+            values[:, i] = store.column(name)
+        return cls(values, feature_names)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    # Rows at the given indices as a new (rows x features) matrix
+    def rows(self, index):
+        return self.values[np.asarray(index, dtype=np.int64)]
+
+    # Draw n rows with replacement using the given numpy Generator
+    def sample(self, n_rows, rng):
+        if n_rows <= 0:
+            return np.empty((0, self.values.shape[1]))
+        return self.rows(self.sample_index(n_rows, rng))
+
+    # Indices of n rows drawn with replacement, for looking up per-row results
+    def sample_index(self, n_rows, rng):
+        return rng.integers(0, len(self), size=max(n_rows, 0))
+
+# Make sure the manifest matches the columns the scaler was fitted on
+def check_manifest(feature_names, scaler):
+    if scaler is None:
+        return
+
+    fitted_names = getattr(scaler, "feature_names_in_", None)
+    if fitted_names is not None and list(fitted_names) != list(feature_names):
+        raise ValueError(f"Feature manifest {list(feature_names)} does not match scaler columns {list(fitted_names)}")
+
+    n_features = getattr(scaler, "n_features_in_", len(feature_names))
+    if n_features != len(feature_names):
+        raise ValueError(f"Scaler expects {n_features} features but the manifest has {len(feature_names)}")
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Percentiles reported for every forecast step
+FORECAST_PERCENTILES = (10, 50, 90)
+
+# Monte Carlo scenarios of future feature rows, driven by historical changes
+#
+# The step-to-step changes of the historical feature rows (in date order) are
+# split into a mean drift and residuals. A scenario starts from the caller's
+# readings and adds one resampled residual vector per step, so correlations
+# between pollutants are kept. History recorded at a coarser step than the
+# forecast (e.g. monthly data, hourly forecast) is rescaled as a random walk:
+# drift by the step fraction, residuals by its square root.
+#
+# All scenarios x steps are produced as one (n_scenarios, horizon, features)
+# array, so the model can score them in a single batched call.
+class ForecastEngine:
+    def __init__(self, history, step_fraction=1.0, lower_bound=0.0):
+        history = np.asarray(history, dtype=np.float64)
+        changes = np.diff(history, axis=0)
+        changes = changes[~np.isnan(changes).any(axis=1)]
+        if len(changes) == 0:
+            raise ValueError("At least two complete historical rows are needed for forecasting")
+
+        self.drift = changes.mean(axis=0)
+        self.residuals = np.ascontiguousarray(changes - self.drift)
+        self.step_fraction = step_fraction
+        self.lower_bound = lower_bound
+
+    # Feature rows for every scenario and step, shape (n_scenarios, horizon, features)
+    def scenarios(self, start, horizon, n_scenarios, rng):
+        start = np.asarray(start, dtype=np.float64)
+        picks = rng.integers(0, len(self.residuals), size=(n_scenarios, horizon))
+        increments = self.residuals[picks]
+        increments *= np.sqrt(self.step_fraction)
+        increments += self.drift * self.step_fraction
+        paths = np.cumsum(increments, axis=1)
+        paths += start
+        if self.lower_bound is not None:
+            # Concentrations can't go negative
+            np.maximum(paths, self.lower_bound, out=paths)
+        return paths
+
+# Mean and percentile bands per step (as arrays) from (n_scenarios, horizon) predictions
+def summarize_scenarios(predictions, percentiles=FORECAST_PERCENTILES, decimals=2):
+    predictions = np.asarray(predictions, dtype=np.float64)
+    summary = {"mean": np.round(predictions.mean(axis=0), decimals)}
+    for percentile, values in zip(percentiles, np.percentile(predictions, percentiles, axis=0)):
+        summary[f"p{percentile}"] = np.round(values, decimals)
+    return summary
+
+# Ratio of the forecast step to the typical spacing of the historical dates
+def step_fraction_for(dates, forecast_step=np.timedelta64(1, "h")):
+    if dates is None or len(dates) < 2:
+        return 1.0
+    spacing = np.median(np.diff(np.asarray(dates).astype("datetime64[s]")).astype(np.float64))
+    if spacing <= 0:
+        return 1.0
+    return float(forecast_step / np.timedelta64(1, "s")) / spacing
@@ -0,0 +1,154 @@
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+# Ridge regression on standardized features, kept as sufficient statistics
+#
+# Only the row count, the feature and target means and the centered
+# co-moment matrices X'X, X'y (and y'y per target) are stored. New rows are
+# merged in with the parallel (Chan et al.) update, so appending a month costs
+# O(new rows * features^2) and never touches the old data. Solving for any
+# number of alphas is one eigendecomposition of the d x d feature matrix.
+#
+# The fitted StandardScaler + Ridge are identical (up to float rounding) to
+# fitting both from scratch on every row seen so far.
+class IncrementalRidge:
+    def __init__(self, feature_names, target_names):
+        self.feature_names = list(feature_names)
+        self.target_names = list(target_names)
+        n_features = len(self.feature_names)
+        n_targets = len(self.target_names)
+        self.n_samples = 0
+        self.x_mean = np.zeros(n_features)
+        self.y_mean = np.zeros(n_targets)
+        self.xx = np.zeros((n_features, n_features))
+        self.xy = np.zeros((n_features, n_targets))
+        self.yy = np.zeros(n_targets)
+
+    # Merge the statistics of a new block of rows (DataFrame or array)
+    def partial_fit(self, X, y):
+        X = self._as_matrix(X, self.feature_names)
+        y = self._as_matrix(y, self.target_names)
+        if len(X) != len(y):
+            raise ValueError(f"X has {len(X)} rows but y has {len(y)}")
+        if len(X) == 0:
+            return self
+
+        n_new = len(X)
+        x_mean_new = X.mean(axis=0)
+        y_mean_new = y.mean(axis=0)
+        X_centered = X - x_mean_new
+        y_centered = y - y_mean_new
+
+        n_total = self.n_samples + n_new
+        weight = self.n_samples * n_new / n_total
+        dx = x_mean_new - self.x_mean
+        dy = y_mean_new - self.y_mean
+
+        self.xx += X_centered.T @ X_centered + weight * np.outer(dx, dx)
+        self.xy += X_centered.T @ y_centered + weight * np.outer(dx, dy)
+        self.yy += np.einsum("ij,ij->j", y_centered, y_centered) + weight * dy * dy
+        self.x_mean += dx * n_new / n_total
+        self.y_mean += dy * n_new / n_total
+        self.n_samples = n_total
+        return self
+
+    # Population variance, as StandardScaler uses
+    @property
+    def x_var(self):
+        return np.diag(self.xx) / max(self.n_samples, 1)
+
+    @property
+    def x_scale(self):
+        scale = np.sqrt(self.x_var)
+        # Same rule as StandardScaler: constant features are left unscaled
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+        return scale
+
+    # X'X and X'y of the standardized, centered features
+    def _scaled_moments(self):
+        scale = self.x_scale
+        return self.xx / np.outer(scale, scale), self.xy / scale[:, None]
+
+    # Coefficients in the standardized space for every alpha: shape (n_alphas, n_targets, n_features)
+    # Also returns the residual sum of squares and effective degrees of freedom per alpha
+    def solve(self, alphas):
+        if self.n_samples == 0:
+            raise ValueError("No data has been added yet")
+        alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+        zz, zy = self._scaled_moments()
+        eigenvalues, eigenvectors = np.linalg.eigh(zz)
+        eigenvalues = np.clip(eigenvalues, 0.0, None)
+        projected = eigenvectors.T @ zy
+
+        coefs = []
+        rss = []
+        dof = []
+        for alpha in alphas:
+            shrink = 1.0 / (eigenvalues + alpha)
+            coef = (eigenvectors @ (shrink[:, None] * projected)).T
+            # ||y - Zw||^2 = y'y - 2 w'Z'y + w'Z'Zw
+            fitted = np.einsum("ij,jk,ik->i", coef, zz, coef)
+            rss.append(self.yy - 2 * np.einsum("ij,ji->i", coef, zy) + fitted)
+            dof.append(np.sum(eigenvalues * shrink))
+            coefs.append(coef)
+        return np.array(coefs), np.clip(np.array(rss), 0.0, None), np.array(dof)
+
+    # Pick the alpha with the lowest generalized cross-validation error summed over targets
+    def select_alpha(self, alphas):
+        alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+        _, rss, dof = self.solve(alphas)
+        # One extra degree of freedom for the intercept
+        denominator = np.maximum(self.n_samples - dof - 1, 1e-12) ** 2
+        gcv = self.n_samples * rss.sum(axis=1) / denominator
+        return float(alphas[np.argmin(gcv)]), gcv
+
+    # Build a fitted StandardScaler and Ridge that drop into main.py like the grid-searched ones
+    def to_sklearn(self, alpha):
+        coefs, _, _ = self.solve([alpha])
+
+        scaler = StandardScaler()
+        scaler.n_features_in_ = len(self.feature_names)
+        scaler.feature_names_in_ = np.array(self.feature_names, dtype=object)
+        scaler.n_samples_seen_ = self.n_samples
+        scaler.mean_ = self.x_mean.copy()
+        scaler.var_ = self.x_var
+        scaler.scale_ = self.x_scale
+
+        model = Ridge(alpha=alpha)
+        model.n_features_in_ = len(self.feature_names)
+        model.coef_ = coefs[0]
+        # The standardized features have zero mean, so the intercept is just the target mean
+        model.intercept_ = self.y_mean.copy()
+        return model, scaler
+
+    def save(self, path):
+        np.savez(path, n_samples=self.n_samples, x_mean=self.x_mean, y_mean=self.y_mean,
+                 xx=self.xx, xy=self.xy, yy=self.yy,
+                 feature_names=np.array(self.feature_names), target_names=np.array(self.target_names))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stats:
+            ridge = cls(stats["feature_names"].tolist(), stats["target_names"].tolist())
+            ridge.n_samples = int(stats["n_samples"])
+            ridge.x_mean = stats["x_mean"].copy()
+            ridge.y_mean = stats["y_mean"].copy()
+            ridge.xx = stats["xx"].copy()
+            ridge.xy = stats["xy"].copy()
+            ridge.yy = stats["yy"].copy()
+        return ridge
+
+    @staticmethod
+    def _as_matrix(values, names):
+        if hasattr(values, "columns"):
+            missing = [name for name in names if name not in values.columns]
+            if missing:
+                raise ValueError(f"Missing columns: {missing}")
+            values = values[names]
+        matrix = np.asarray(values, dtype=np.float64)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(-1, 1)
+        if matrix.shape[1] != len(names):
+            raise ValueError(f"Expected {len(names)} columns, got {matrix.shape[1]}")
+        return matrix
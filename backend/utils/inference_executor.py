@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTOR_MODES = ("thread", "process")
+
+# Base class for "inference is temporarily unavailable" errors
+class InferenceUnavailable(Exception):
+    pass
+
+# Raised when every worker is busy and the queue is full
+class ExecutorSaturated(InferenceUnavailable):
+    pass
+
+# Raised when a job does not finish within its timeout
+class InferenceTimeout(InferenceUnavailable):
+    pass
+
+# Runs CPU-bound model calls off the asyncio event loop
+#
+# Jobs go to a thread or process pool. At most max_workers jobs run and at
+# most max_queue more wait; beyond that new jobs are rejected immediately so
+# callers can answer with 503 instead of piling up latency. A job's slot is
+# released when it actually finishes, even if its caller already timed out.
+class InferenceExecutor:
+    def __init__(self, mode="thread", max_workers=4, max_queue=32, timeout=10.0):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Executor mode must be one of {EXECUTOR_MODES}, got '{mode}'")
+        self.mode = mode
+        self.max_workers = max(int(max_workers), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.timeout = timeout
+
+        self._pool = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._lock = threading.Lock()
+
+    # Jobs that can be running or waiting at the same time
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    # Pools are created on first use so importing the app stays cheap
+    def _get_pool(self):
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._pool
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    # Run fn(*args) on the pool and wait for its result
+    # In process mode fn and args must be picklable (e.g. module-level functions)
+    async def run(self, fn, *args, timeout=None):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise ExecutorSaturated(f"Inference queue is full ({self.capacity} jobs in flight)")
+            self._in_flight += 1
+
+        try:
+            future = self._get_pool().submit(functools.partial(fn, *args))
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            # Cancelling the wrapped future also drops the job if it has not started yet
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise InferenceTimeout(f"Inference did not finish within {timeout or self.timeout} seconds")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
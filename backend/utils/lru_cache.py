@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+
+# Thread-safe LRU of computed values, looked up and stored a batch of keys at a time
+#
+# None marks a missing entry, so None itself cannot be cached. hits and misses
+# count single keys and are read by the /metrics gauges. A max_items of 0 or
+# less disables the cache: nothing is stored and every key misses.
+class LRUCache:
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Cached values for the keys, None where a key is missing
+    def get_many(self, keys):
+        values = []
+        with self._lock:
+            for key in keys:
+                value = self._items.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                values.append(value)
+        return values
+
+    def put_many(self, keys, values):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._items[key] = value
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
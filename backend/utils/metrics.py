@@ -0,0 +1,119 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fixed-bucket latency histogram in the Prometheus style
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+# Collects histograms and gauges and renders them in Prometheus text format
+#
+# Histograms are keyed by metric name plus a sorted tuple of label pairs.
+# Gauges are callbacks evaluated at scrape time, so exporting executor or
+# batcher stats costs nothing on the request path.
+class MetricsRegistry:
+    def __init__(self, prefix="aq"):
+        self.prefix = prefix
+        self._histograms = {}
+        self._help = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Time the body of a with-block into the named histogram
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # Context manager factory for a per-stage histogram with fixed labels
+    # stage_timer("h", endpoint="x")("predict") times the "predict" stage of endpoint x into h
+    def stage_timer(self, name, **labels):
+        def timer(stage):
+            return self.time(name, stage=stage, **labels)
+        return timer
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    # fn() returns a number or a dict of {label value: number} for label_name
+    # metric_type is "gauge", or "counter" for values that only ever grow
+    def gauge(self, name, fn, help_text="", label_name=None, metric_type="gauge"):
+        self._gauges[name] = (fn, label_name, metric_type)
+        if help_text:
+            self._help[name] = help_text
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            by_name = {}
+            for (name, labels), histogram in histograms:
+                by_name.setdefault(name, []).append((labels, histogram))
+
+            for name, series in by_name.items():
+                full_name = f"{self.prefix}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full_name} {self._help[name]}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+
+        for name, (fn, label_name, metric_type) in sorted(self._gauges.items()):
+            full_name = f"{self.prefix}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            value = fn()
+            if isinstance(value, dict):
+                for label_value, item in sorted(value.items()):
+                    lines.append(f"{full_name}{_format_labels(((label_name, label_value),))} {item}")
+            else:
+                lines.append(f"{full_name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+# Stage timer that records nothing, used when no metrics are wanted
+def null_timer(stage):
+    return nullcontext()
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
@@ -0,0 +1,102 @@
+import asyncio
+
+import numpy as np
+
+# Coalesces feature rows from concurrent requests into one model call
+#
+# Rows submitted within max_wait seconds of the first pending row (or until
+# max_rows rows are pending) are concatenated, predicted with a single call
+# through run_fn, and the result rows are scattered back to each caller.
+# Rows are only batched with rows submitted under the same key (e.g. a model
+# version); the key is passed to predict_fn(key, features, output).
+class MicroBatcher:
+    def __init__(self, predict_fn, run_fn, output=None, max_wait=0.002, max_rows=512):
+        self.predict_fn = predict_fn
+        # run_fn(fn, *args) is awaited to execute the batch, e.g. InferenceExecutor.run
+        self.run_fn = run_fn
+        self.output = output
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+
+        self._pending = []
+        self._pending_rows = 0
+        self._timer = None
+        # The event loop only keeps weak references to tasks, so running batches are held here
+        self._tasks = set()
+        self._batches = 0
+        self._rows = 0
+        self._requests = 0
+
+    # Predict a (rows x features) matrix as part of the next batch
+    async def predict(self, features, key=None):
+        features = np.asarray(features, dtype=np.float64)
+        self._requests += 1
+
+        # Batching disabled: run the request on its own
+        if self.max_wait <= 0:
+            self._record_batch(len(features))
+            return await self.run_fn(self.predict_fn, key, features, self.output)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future, key))
+        self._pending_rows += len(features)
+
+        if self._pending_rows >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    # Hand everything pending to a new batch task
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending
+        self._pending = []
+        self._pending_rows = 0
+        # One batch per key, normally just one
+        groups = {}
+        for rows, future, key in batch:
+            groups.setdefault(key, []).append((rows, future))
+        loop = asyncio.get_running_loop()
+        for key, group in groups.items():
+            task = loop.create_task(self._run_batch(key, group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key, batch):
+        features = np.concatenate([rows for rows, _ in batch], axis=0)
+        self._record_batch(len(features))
+
+        try:
+            predictions = await self.run_fn(self.predict_fn, key, features, self.output)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Scatter each caller's slice of the batch back to it
+        start = 0
+        for rows, future in batch:
+            end = start + len(rows)
+            if not future.done():
+                future.set_result(predictions[start:end])
+            start = end
+
+    def _record_batch(self, n_rows):
+        self._batches += 1
+        self._rows += n_rows
+
+    def stats(self):
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "rows": self._rows,
+            "mean_batch_rows": self._rows / self._batches if self._batches else 0.0,
+            "pending_rows": self._pending_rows,
+        }
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+
+# Version name used for model files placed directly in the models directory
+BASE_VERSION = "base"
+
+# A model and the scaler it was trained with, loaded from one version directory
+# Bundles are never modified after loading, so a request that holds one keeps
+# a consistent model/scaler pair even if a newer version is activated meanwhile.
+class ModelBundle:
+    def __init__(self, version, model, scaler, path):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.path = path
+        self.loaded_at = time.time()
+
+# Versioned store of one model + scaler pair with hot reload and rollback
+#
+# Layout:  models_dir/<model_file>, <scaler_file>            -> version "base"
+#          models_dir/<version>/<model_file>, <scaler_file>  -> version "<version>"
+# Versions are ordered naturally (v2 < v10); the newest complete one is active.
+# Publish a version by writing it under a hidden name (".v3") and renaming it,
+# so the watcher never sees half-copied files.
+#
+# loader(version, path) returns the (model, scaler) pair instead of unpickling the files
+# (e.g. to map a prebuilt copy), prepare(model, scaler) returns the model to serve (e.g. a compiled forest),
+# validate(bundle) runs a warm-up prediction and raises if the bundle is unusable.
+# A version that fails, or that was rolled back, is skipped until a newer one appears.
+class ModelRegistry:
+    def __init__(self, name, models_dir, model_file, scaler_file, prepare=None, validate=None,
+                 poll_interval=30.0, max_loaded=3, loader=None):
+        self.name = name
+        self.models_dir = models_dir
+        self.model_file = model_file
+        self.scaler_file = scaler_file
+        self.prepare = prepare
+        self.validate = validate
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.max_loaded = max_loaded
+
+        self.current = None
+        self.history = []
+        self.rejected = set()
+        self.swaps = 0
+        self._loaded = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._task = None
+
+    # Complete versions on disk, oldest first
+    def available_versions(self):
+        versions = []
+        if self._is_complete(self.models_dir):
+            versions.append(BASE_VERSION)
+        try:
+            entries = sorted(os.listdir(self.models_dir), key=_natural_key)
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            path = os.path.join(self.models_dir, entry)
+            if not entry.startswith((".", "_")) and os.path.isdir(path) and self._is_complete(path):
+                versions.append(entry)
+        return versions
+
+    def _is_complete(self, path):
+        return (os.path.isfile(os.path.join(path, self.model_file))
+                and os.path.isfile(os.path.join(path, self.scaler_file)))
+
+    def _version_path(self, version):
+        return self.models_dir if version == BASE_VERSION else os.path.join(self.models_dir, version)
+
+    # Load, prepare and validate a version without activating it
+    def load(self, version):
+        path = self._version_path(version)
+        if self.loader is not None:
+            model, scaler = self.loader(version, path)
+        else:
+            import joblib
+
+            model = joblib.load(os.path.join(path, self.model_file))
+            scaler = joblib.load(os.path.join(path, self.scaler_file))
+        if self.prepare is not None:
+            model = self.prepare(model, scaler)
+        bundle = ModelBundle(version, model, scaler, path)
+        if self.validate is not None:
+            self.validate(bundle)
+        return bundle
+
+    # Bundle for a version, loading it on first use (process workers follow the parent this way)
+    def get(self, version=None):
+        current = self.current
+        if version is None or (current is not None and current.version == version):
+            return current
+        with self._lock:
+            bundle = self._loaded.get(version)
+            if bundle is None:
+                bundle = self._remember(self.load(version))
+            return bundle
+
+    def _remember(self, bundle):
+        self._loaded[bundle.version] = bundle
+        # Keep the active version and the rollback history; drop the rest
+        keep = {self.current.version if self.current else None, bundle.version, *self.history}
+        for version in list(self._loaded):
+            if len(self._loaded) > self.max_loaded and version not in keep:
+                del self._loaded[version]
+        return bundle
+
+    # Validate and switch to a version; requests already holding the old bundle finish on it
+    def activate(self, version):
+        return self._swap_in(self.load(version))
+
+    # Make a loaded bundle the active one, unless skip() (checked under the lock) returns True
+    def _swap_in(self, bundle, skip=None):
+        version = bundle.version
+        with self._lock:
+            if skip is not None and skip():
+                return None
+            previous = self.current
+            self._remember(bundle)
+            if previous is not None and previous.version != version:
+                self.history.append(previous.version)
+                del self.history[:-self.max_loaded]
+            self.current = bundle
+            self.rejected.discard(version)
+            self.swaps += 1
+        logging.info(f"{self.name} model version {version} activated")
+        self._notify(previous, bundle)
+        return bundle
+
+    # Switch back to the previously active version
+    def rollback(self):
+        with self._lock:
+            if not self.history:
+                raise LookupError(f"No previous {self.name} model version to roll back to")
+            version = self.history[-1]
+            bundle = self._loaded.get(version) or self.load(version)
+            previous = self.current
+            self.history.pop()
+            # Keep the watcher from re-activating the version that was just rolled back
+            self.rejected.add(previous.version)
+            self._remember(bundle)
+            self.current = bundle
+            self.swaps += 1
+        logging.warning(f"{self.name} model rolled back from {previous.version} to {version}")
+        self._notify(previous, bundle)
+        return bundle
+
+    # Activate the newest version on disk if it is newer than the active one
+    # Returns the new bundle, or None if nothing changed
+    def check_for_updates(self):
+        latest = self._update_candidate()
+        if latest is None:
+            return None
+        current = self.current
+        try:
+            bundle = self.load(latest)
+        except Exception as e:
+            if current is None:
+                raise
+            with self._lock:
+                self.rejected.add(latest)
+            logging.error(f"{self.name} model version {latest} failed validation, keeping {current.version}: {str(e)}")
+            return None
+        # Loading takes a while; a rollback may have rejected the version (or another check may have
+        # activated it) meanwhile, so decide again under the lock before swapping
+        return self._swap_in(bundle, skip=lambda: self._update_candidate() != latest)
+
+    # Newest version on disk that is not rejected and newer than the active one, or None
+    def _update_candidate(self):
+        with self._lock:
+            ordered = self.available_versions()
+            versions = [version for version in ordered if version not in self.rejected]
+            if not versions:
+                if self.current is None:
+                    raise FileNotFoundError(f"No {self.name} model found in {self.models_dir}")
+                return None
+
+            latest = versions[-1]
+            current = self.current
+            if current is not None:
+                if latest == current.version:
+                    return None
+                # Never move backwards, e.g. after a rollback to an older version
+                if current.version in ordered and ordered.index(latest) < ordered.index(current.version):
+                    return None
+            return latest
+
+    # listener(old_bundle, new_bundle) is called after every swap
+    def on_swap(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, previous, bundle):
+        for listener in self._listeners:
+            try:
+                listener(previous, bundle)
+            except Exception as e:
+                logging.error(f"{self.name} model swap listener failed: {str(e)}")
+
+    def status(self):
+        return {
+            "current": self.current.version if self.current else None,
+            "previous": list(reversed(self.history)),
+            "available": self.available_versions(),
+            "rejected": sorted(self.rejected),
+            "loaded_at": self.current.loaded_at if self.current else None,
+        }
+
+    # Poll the models directory; loading runs on a thread so requests keep being served
+    async def _watch_forever(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.check_for_updates)
+            except Exception as e:
+                logging.error(f"{self.name} model check failed: {str(e)}")
+
+    def start(self):
+        if self._task is None and self.poll_interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._watch_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Sort key that orders embedded numbers numerically: v2 < v10, 2024-9 < 2024-10
+def _natural_key(name):
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", name) if part]
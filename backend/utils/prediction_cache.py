@@ -0,0 +1,80 @@
+import numpy as np
+
+from utils.lru_cache import LRUCache
+
+# Model outputs for every row of a feature matrix, computed once per model version
+#
+# The endpoints that draw random dataset rows look their predictions up here
+# instead of scaling and predicting them again: a row's prediction cannot change
+# while the same version is active. Only the table of the latest version set is
+# kept; lookups for any other version miss, and the caller runs the model.
+class PredictionTable:
+    def __init__(self):
+        # (version, rows x outputs array), replaced as a whole so readers never see a mix
+        self._table = None
+        self.hits = 0
+        self.misses = 0
+
+    def set(self, version, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2:
+            raise ValueError(f"Prediction table must be rows x outputs, got shape {values.shape}")
+        self._table = (version, values)
+
+    # Predictions of the given rows (one output column if output is given),
+    # or None if the table holds another version
+    def lookup(self, version, index, output=None):
+        table = self._table
+        if table is None or table[0] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        values = table[1][np.asarray(index, dtype=np.int64)]
+        return values[:, output] if output is not None else values
+
+    @property
+    def version(self):
+        return self._table[0] if self._table is not None else None
+
+    def __len__(self):
+        return len(self._table[1]) if self._table is not None else 0
+
+# Thread-safe LRU of per-row predictions for caller-supplied feature vectors
+#
+# Rows are keyed by the model version and their scaled features rounded to a
+# multiple of quantum, so vectors that differ only by float noise share an entry.
+# Scaled features are in standard deviations, so the default quantum is far below
+# the precision of any reading. Entries of other versions are never returned;
+# clear() frees them when the model changes.
+class PredictionCache(LRUCache):
+    def __init__(self, max_rows=100000, quantum=1e-6):
+        super().__init__(max_rows)
+        self.quantum = quantum
+
+    # Cache key of every row of a scaled (rows x features) matrix
+    def keys(self, version, features_scaled):
+        # Adding 0.0 turns -0.0 into 0.0 so both round to the same key
+        quantized = np.ascontiguousarray(np.round(np.asarray(features_scaled, dtype=np.float64) / self.quantum) + 0.0)
+        return [(version, row.tobytes()) for row in quantized]
+
+    # Cached predictions of a scaled (rows x features) matrix: the row keys,
+    # the cached rows (None where missing) and the indices of the rows to predict.
+    # Rows with the same key are looked up once, and only the first of them is
+    # listed as missing, so a batch never sends the model the same row twice.
+    def lookup(self, version, features_scaled):
+        keys = self.keys(version, features_scaled)
+        first = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+        cached = dict(zip(first, self.get_many(first)))
+        rows = [cached[key] for key in keys]
+        missing = np.array([i for key, i in first.items() if cached[key] is None], dtype=np.int64)
+        return keys, rows, missing
+
+    # Store the predictions of the missing rows and return the full (rows x outputs) matrix
+    def fill(self, keys, rows, missing, predictions):
+        predicted = np.asarray(predictions).tolist()
+        missing_keys = [keys[i] for i in missing]
+        self.put_many(missing_keys, predicted)
+        by_key = dict(zip(missing_keys, predicted))
+        return np.array([by_key[key] if row is None else row for key, row in zip(keys, rows)], dtype=np.float64)
@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Statistical profiler that samples every thread's stack on a timer
+#
+# Stacks are aggregated in the "collapsed" format used by flame graph tools
+# (frame;frame;frame count). Sampling runs on its own daemon thread, so the
+# request path only pays for it while the profiler is switched on.
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.total_samples = 0
+        self.started_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._sample_forever, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.total_samples = 0
+
+    def _sample_forever(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self.samples[self._collapse(frame)] += 1
+                self.total_samples += 1
+
+    def _collapse(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    # Most frequent stacks in collapsed format, one "stack count" per line
+    def collapsed(self, limit=None):
+        with self._lock:
+            items = self.samples.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in items) + "\n"
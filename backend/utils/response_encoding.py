@@ -0,0 +1,151 @@
+import importlib.util
+import json
+
+import numpy as np
+
+# Optional encoders; JSON falls back to the standard library and the binary formats
+# are only offered when their package is installed
+# msgpack and pyarrow are imported on first use, so they don't slow down startup
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Short names used in metrics and benchmark output
+FORMAT_NAMES = {JSON_MEDIA_TYPE: "json", MSGPACK_MEDIA_TYPE: "msgpack", ARROW_MEDIA_TYPE: "arrow"}
+
+# Other names clients use for the same formats
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+# Raised when a payload cannot be represented in the requested format
+class EncodingError(ValueError):
+    pass
+
+# JSON for payloads that may hold NumPy arrays and scalars
+# orjson writes float64 arrays straight from their buffer; without it the arrays
+# go through tolist(), which is still one C call per array rather than per value.
+# NaN is written as null either way.
+def encode_json(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=_to_builtin, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_to_builtin, allow_nan=False, separators=(",", ":")).encode()
+
+def _to_builtin(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f" and np.isnan(value).any():
+            return np.where(np.isnan(value), None, value).tolist()
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+        return None if isinstance(value, float) and np.isnan(value) else value
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+# MessagePack with every array packed as {"dtype", "shape", "data"}
+# data is the raw little-endian buffer, so np.frombuffer(data, dtype).reshape(shape)
+# (or a typed array in JavaScript) restores it without per-value decoding
+def encode_msgpack(content):
+    import msgpack
+
+    return msgpack.packb(content, default=_pack_array, use_bin_type=True)
+
+def _pack_array(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind not in "biuf":
+            return value.tolist()
+        array = np.ascontiguousarray(value, dtype=value.dtype.newbyteorder("<"))
+        return {"dtype": array.dtype.str, "shape": list(array.shape), "data": array.tobytes()}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+# Arrow IPC stream holding one record batch
+# The NumPy arrays of the payload become the columns, with nested dicts of arrays
+# flattened to "parent.child" names and the columns of 2-D arrays to "name.0", "name.1", ...;
+# everything else goes into the schema metadata under "payload" as JSON.
+# The columns must all have the same length.
+def encode_arrow(content):
+    import pyarrow
+    import pyarrow.ipc
+
+    columns = {}
+    metadata = {}
+    for name, value in _flatten(content):
+        if isinstance(value, np.ndarray) and value.ndim == 1:
+            columns[name] = value
+        elif isinstance(value, np.ndarray) and value.ndim == 2:
+            for i in range(value.shape[1]):
+                columns[f"{name}.{i}"] = value[:, i]
+        else:
+            metadata[name] = value
+
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1:
+        raise EncodingError("This response has columns of different lengths and cannot be sent as Arrow")
+
+    batch = pyarrow.RecordBatch.from_pydict(
+        {name: pyarrow.array(column, from_pandas=True) for name, column in columns.items()},
+        metadata={"payload": encode_json(metadata)},
+    )
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def _flatten(content, prefix=""):
+    for key, value in content.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and any(isinstance(item, np.ndarray) for item in value.values()):
+            yield from _flatten(value, f"{name}.")
+        else:
+            yield name, value
+
+# Media type -> encoder for the formats available in this environment, preferred first
+def available_encoders():
+    encoders = {JSON_MEDIA_TYPE: encode_json}
+    if importlib.util.find_spec("msgpack") is not None:
+        encoders[MSGPACK_MEDIA_TYPE] = encode_msgpack
+    if importlib.util.find_spec("pyarrow") is not None:
+        encoders[ARROW_MEDIA_TYPE] = encode_arrow
+    return encoders
+
+ENCODERS = available_encoders()
+
+# Pick the media type for an Accept header
+# Returns the supported type with the highest q-value (ties go to the order the
+# client listed them in), JSON when the header is missing or accepts anything,
+# and None when the client only accepts formats that are not available.
+def negotiate(accept):
+    if not accept:
+        return JSON_MEDIA_TYPE
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        media_type = media_type.lower()
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON_MEDIA_TYPE
+        media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+        if media_type in ENCODERS:
+            candidates.append((-quality, position, media_type))
+    if not candidates:
+        return None
+    return min(candidates)[2]
+
+def encode(content, media_type):
+    return ENCODERS[media_type](content)
@@ -0,0 +1,123 @@
+import contextlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from utils.column_store import source_signature
+
+# fcntl is POSIX only; without it concurrent builders race, but the rename keeps every copy complete
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_FORMAT_VERSION = 2
+
+# Read-only arrays shared by every process of the server through memory-mapped files
+#
+# Each artifact is a directory of .npy files plus a manifest recording the
+# files it was built from. The first process to need an artifact builds it
+# under an exclusive lock and publishes it with a rename; every process then
+# maps the files read-only, so all workers share one copy of the pages in the
+# OS page cache instead of each holding a private one. An artifact is rebuilt
+# when one of its source files changes.
+class ArtifactCache:
+    def __init__(self, root):
+        self.root = root
+        # name -> bytes of the arrays this process has mapped
+        self.mapped = {}
+
+    # Arrays and metadata of an artifact, building it first if it is missing or stale
+    # build() returns ({name: array}, metadata dict); key holds anything else the
+    # artifact depends on (e.g. the feature names) and must be JSON serializable
+    def load(self, name, sources, build, key=None):
+        path = os.path.join(self.root, name)
+        signature = {"format": ARTIFACT_FORMAT_VERSION,
+                     "sources": [source_signature(source) for source in sources if os.path.exists(source)],
+                     "key": key}
+
+        artifact = self._open_if_current(path, signature)
+        if artifact is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with _exclusive_lock(path + ".lock"):
+                # Another process may have built it while this one waited for the lock
+                artifact = self._open_if_current(path, signature)
+                if artifact is None:
+                    arrays, metadata = build()
+                    _write(path, arrays, metadata, signature)
+                    artifact = self._open_if_current(path, signature)
+
+        arrays, metadata = artifact
+        self.mapped[name] = sum(array.nbytes for array in arrays.values())
+        return arrays, metadata
+
+    def _open_if_current(self, path, signature):
+        try:
+            with open(os.path.join(path, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if manifest.get("signature") != signature:
+            return None
+        # np.asarray drops the memmap subclass but keeps the read-only mapping
+        arrays = {array_name: np.asarray(np.load(os.path.join(path, filename), mmap_mode="r"))
+                  for array_name, filename in manifest["arrays"].items()}
+        return arrays, manifest["metadata"]
+
+    # Bytes of artifact data mapped by this process
+    @property
+    def nbytes(self):
+        return sum(self.mapped.values())
+
+def _write(path, arrays, metadata, signature):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    files = {}
+    for i, (array_name, values) in enumerate(arrays.items()):
+        filename = f"a{i:03d}.npy"
+        np.save(os.path.join(tmp_path, filename), np.ascontiguousarray(values))
+        files[array_name] = filename
+    with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+        json.dump({"signature": signature, "arrays": files, "metadata": metadata}, f, indent=2)
+
+    # Processes that mapped the old files keep them until they unmap; new ones see the new directory
+    old_path = f"{path}.old{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+@contextlib.contextmanager
+def _exclusive_lock(lock_path):
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Resident memory of this process in bytes, from /proc (Linux only; empty elsewhere)
+# rss counts every resident page; pss splits shared pages between the processes mapping
+# them; shared is the resident part also mapped by another process; private is the rest
+def process_memory():
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    memory = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                field, _, value = line.partition(":")
+                if field in fields:
+                    kind = fields[field]
+                    memory[kind] = memory.get(kind, 0) + int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return memory
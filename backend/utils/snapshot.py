@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+# In-memory result of an expensive computation, refreshed in the background
+#
+# compute_fn is awaited once per interval; requests read the latest payload
+# and its ETag without doing any work themselves. A failed refresh keeps
+# the previous payload so clients never see a gap. Refreshes requested while
+# one is running (e.g. many requests right after an invalidate) share it.
+class Snapshot:
+    def __init__(self, compute_fn, interval):
+        self.compute_fn = compute_fn
+        self.interval = interval
+
+        self.payload = None
+        self.etag = None
+        self.updated_at = None
+        self._task = None
+        self._refreshing = None
+        self._listeners = []
+        # Event loop of the background task, for refreshes requested from other threads
+        self._loop = None
+        self._followup = None
+        self._followup_scheduled = False
+
+    # listener(payload, etag) is called after every successful refresh
+    def on_refresh(self, listener):
+        self._listeners.append(listener)
+
+    # Recompute the payload now, or wait for the refresh already running
+    # The shared refresh is shielded so a caller that is cancelled does not cancel it for the others
+    async def refresh(self):
+        task = self._refreshing
+        if task is None:
+            task = self._refreshing = asyncio.get_running_loop().create_task(self._compute())
+            task.add_done_callback(self._refresh_done)
+        return await asyncio.shield(task)
+
+    def _refresh_done(self, task):
+        if self._refreshing is task:
+            self._refreshing = None
+        # Retrieve the exception so a refresh nobody waited for doesn't log "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def _compute(self):
+        payload = await self.compute_fn()
+        body = json.dumps(payload, sort_keys=True, default=str).encode()
+        self.payload = payload
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        self.updated_at = time.time()
+        for listener in self._listeners:
+            try:
+                listener(payload, self.etag)
+            except Exception as e:
+                logging.error(f"Snapshot listener failed: {str(e)}")
+        return payload
+
+    # Return the payload, computing it first if no refresh has finished yet
+    async def get(self):
+        if self.payload is None:
+            return await self.refresh()
+        return self.payload
+
+    # Drop the payload and recompute it right away (e.g. after a model swap), so
+    # listeners such as streams get the new result without waiting for the interval
+    # Safe to call from any thread; invalidations arriving together share one refresh
+    def invalidate(self):
+        self.payload = None
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._schedule_followup)
+
+    def _schedule_followup(self):
+        if not self._followup_scheduled:
+            self._followup_scheduled = True
+            self._followup = asyncio.get_running_loop().create_task(self._refresh_after_invalidate())
+
+    async def _refresh_after_invalidate(self):
+        # A refresh already running may have started before the invalidation; let it finish first
+        running = self._refreshing
+        if running is not None:
+            await asyncio.wait([running])
+        self._followup_scheduled = False
+        try:
+            await self.refresh()
+        except Exception as e:
+            logging.error(f"Snapshot refresh failed: {str(e)}")
+
+    # Seconds until the next scheduled refresh, used for Cache-Control max-age
+    def max_age(self):
+        if self.updated_at is None:
+            return 0
+        return max(int(self.updated_at + self.interval - time.time()), 0)
+
+    async def _refresh_forever(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Snapshot refresh failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self._refresh_forever())
+
+    async def stop(self):
+        self._loop = None
+        for task in (self._task, self._followup, self._refreshing):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._followup = None
+        self._refreshing = None
+
+# True if an If-None-Match header value matches the given ETag
+def etag_matches(if_none_match, etag):
+    if not if_none_match or etag is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
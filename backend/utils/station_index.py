@@ -0,0 +1,77 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Monitoring sites with their readings, indexed for nearest-station lookups
+#
+# The sites are held in a KD-tree of their 3D unit vectors. The straight-line
+# (chord) distance between unit vectors grows with the great-circle distance,
+# so the tree's k nearest are exactly the k nearest on the sphere, found in
+# O(log n) per point. The tree is built with the index, i.e. while the app
+# loads its state, and scipy is only imported when a station file is used.
+# Feature rows for arbitrary locations are built by inverse-distance weighting
+# the readings of the nearest stations, in the model's feature order.
+class StationIndex:
+    def __init__(self, names, latitudes, longitudes, features, feature_names):
+        self.names = list(names)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.features = np.ascontiguousarray(features, dtype=np.float64)
+        self.feature_names = list(feature_names)
+        if len(self.names) == 0:
+            raise ValueError("At least one station is needed")
+        from scipy.spatial import cKDTree
+
+        self._tree = cKDTree(_unit_vectors(self.latitudes, self.longitudes))
+
+    # Stations from a CSV with name, latitude, longitude and one column per feature
+    # Feature columns the file doesn't have are filled with the given defaults
+    @classmethod
+    def from_frame(cls, data, feature_names, defaults=None):
+        features = np.empty((len(data), len(feature_names)))
+        for i, name in enumerate(feature_names):
+            if name in data.columns:
+                features[:, i] = data[name].to_numpy(dtype=np.float64)
+            elif defaults is not None:
+                features[:, i] = defaults[i]
+            else:
+                raise ValueError(f"Stations are missing feature column '{name}'")
+        return cls(data["name"], data["latitude"], data["longitude"], features, feature_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    # Names, coordinates and feature rows, for saving the index (e.g. to an ArtifactCache)
+    def to_arrays(self):
+        return ({"latitudes": self.latitudes, "longitudes": self.longitudes, "features": self.features},
+                {"names": self.names, "feature_names": self.feature_names})
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        return cls(metadata["names"], arrays["latitudes"], arrays["longitudes"], arrays["features"],
+                   metadata["feature_names"])
+
+    # Indices of and distances (km) to the k nearest stations of every point, shape (points, k)
+    def nearest(self, latitudes, longitudes, k=3):
+        k = min(k, len(self))
+        points = _unit_vectors(np.ravel(latitudes), np.ravel(longitudes))
+        chords, indices = self._tree.query(points, k=k)
+        chords = np.asarray(chords, dtype=np.float64).reshape(len(points), k)
+        indices = np.asarray(indices, dtype=np.int64).reshape(len(points), k)
+        # Chord length c on the unit sphere spans an angle of 2 * arcsin(c / 2)
+        return indices, 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chords / 2, 0.0, 1.0))
+
+    # Inverse-distance weighted feature rows for every point, shape (points, features)
+    def interpolate(self, latitudes, longitudes, k=3, power=2.0, min_distance_km=0.05):
+        indices, distances = self.nearest(latitudes, longitudes, k)
+        # A point on top of a station takes that station's readings
+        weights = 1.0 / np.maximum(distances, min_distance_km) ** power
+        weights /= weights.sum(axis=1, keepdims=True)
+        return np.einsum("pk,pkf->pf", weights, self.features[indices])
+
+# Points on the unit sphere for latitudes and longitudes in degrees, shape (points, 3)
+def _unit_vectors(latitudes, longitudes):
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(latitudes)
+    return np.column_stack([cos_lat * np.cos(longitudes), cos_lat * np.sin(longitudes), np.sin(latitudes)])
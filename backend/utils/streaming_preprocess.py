@@ -0,0 +1,188 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Rows read per chunk by the streaming passes
+DEFAULT_CHUNKSIZE = 100_000
+
+# Sketch accuracy parameter; larger k means smaller error and more memory
+DEFAULT_SKETCH_K = 200
+
+# IQR multiplier, as in the in-memory filter
+IQR_FACTOR = 1.5
+
+# KLL quantile sketch (Karnin, Lang & Liberty 2016)
+#
+# Values are kept in a stack of compactors; level h holds items of weight 2^h.
+# When a level outgrows its capacity it is sorted and every other item (from a
+# random offset) is promoted, halving it. Memory is O(k) regardless of the
+# number of values; normalized rank error is about rank_error() with 99% confidence.
+class KLLSketch:
+    def __init__(self, k=DEFAULT_SKETCH_K, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * self.c ** depth)))
+
+    # Add a batch of values; NaNs are ignored
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if self.levels[level].size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                # An odd item out stays behind so the total weight is preserved
+                keep = items[:items.size % 2]
+                items = items[items.size % 2:]
+                promoted = items[self._rng.integers(0, 2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # Capacities shrink when a level is added, so start over from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2 ** h, dtype=np.float64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    # Approximate q-quantile(s), q in [0, 1]
+    def quantile(self, q):
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        items, cumulative = self._weighted_items()
+        targets = np.clip(np.asarray(q, dtype=np.float64), 0.0, 1.0) * cumulative[-1]
+        index = np.minimum(np.searchsorted(cumulative, targets, side="left"), items.size - 1)
+        return items[index] if np.ndim(q) else float(items[index])
+
+    # Normalized rank error at 99% confidence, using the empirical constants
+    # published with the Apache DataSketches KLL implementation
+    def rank_error(self):
+        return 2.296 / self.k ** 0.9723
+
+    @property
+    def retained(self):
+        return sum(level.size for level in self.levels)
+
+# Column quantiles estimated from streaming chunks, with a band that contains the exact value
+class QuantileEstimate:
+    def __init__(self, column, q, value, low, high):
+        self.column = column
+        self.q = q
+        self.value = value
+        self.low = low
+        self.high = high
+
+# Lower and upper IQR fences for one column plus the range each fence could take
+# given the quantile error bands
+class ColumnFences:
+    def __init__(self, column, q1, q3, factor=IQR_FACTOR):
+        self.column = column
+        self.q1 = q1
+        self.q3 = q3
+        iqr = q3.value - q1.value
+        self.lower = q1.value - factor * iqr
+        self.upper = q3.value + factor * iqr
+        # Extremes of q - factor * (q3 - q1) over the bands
+        self.lower_band = (q1.low - factor * (q3.high - q1.low), q1.high - factor * (q3.low - q1.high))
+        self.upper_band = (q3.low + factor * (q3.low - q1.high), q3.high + factor * (q3.high - q1.low))
+
+# First pass: sketch Q1 and Q3 of every numeric column over the rows without missing values
+def estimate_fences(filepath, chunksize=DEFAULT_CHUNKSIZE, sketch_k=DEFAULT_SKETCH_K, seed=42, **read_csv_args):
+    sketches = None
+    numeric_cols = None
+    rows = 0
+    for chunk in pd.read_csv(filepath, chunksize=chunksize, **read_csv_args):
+        chunk = chunk.dropna()
+        if numeric_cols is None:
+            # Numeric columns are fixed by the first chunk
+            numeric_cols = list(chunk.select_dtypes(include=[np.number]).columns)
+            sketches = {col: KLLSketch(k=sketch_k, seed=seed + i) for i, col in enumerate(numeric_cols)}
+        rows += len(chunk)
+        for col in numeric_cols:
+            sketches[col].update(pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64))
+
+    fences = {}
+    for col, sketch in (sketches or {}).items():
+        epsilon = sketch.rank_error()
+        low1, q1, high1, low3, q3, high3 = sketch.quantile([0.25 - epsilon, 0.25, 0.25 + epsilon,
+                                                            0.75 - epsilon, 0.75, 0.75 + epsilon])
+        fences[col] = ColumnFences(col, QuantileEstimate(col, 0.25, q1, low1, high1),
+                                   QuantileEstimate(col, 0.75, q3, low3, high3))
+    return fences, rows
+
+# Second pass: drop rows with missing values or any value outside the fences and stream the
+# rest to output_path. Rows with a value inside a fence band might be classified differently
+# by the exact in-memory filter; their count is the reported error bound.
+def stream_iqr_filter(filepath, output_path, chunksize=DEFAULT_CHUNKSIZE, sketch_k=DEFAULT_SKETCH_K,
+                      seed=42, **read_csv_args):
+    fences, rows_after_dropna = estimate_fences(filepath, chunksize, sketch_k, seed, **read_csv_args)
+
+    rows_read = 0
+    rows_kept = 0
+    uncertain_rows = 0
+    header = True
+    with open(output_path, "w", newline="") as output:
+        for chunk in pd.read_csv(filepath, chunksize=chunksize, **read_csv_args):
+            rows_read += len(chunk)
+            chunk = chunk.dropna()
+            outlier = np.zeros(len(chunk), dtype=bool)
+            uncertain = np.zeros(len(chunk), dtype=bool)
+            for col, fence in fences.items():
+                values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+                outlier |= (values < fence.lower) | (values > fence.upper)
+                uncertain |= ((values >= fence.lower_band[0]) & (values <= fence.lower_band[1])) | \
+                             ((values >= fence.upper_band[0]) & (values <= fence.upper_band[1]))
+            kept = chunk[~outlier]
+            kept.to_csv(output, index=False, header=header)
+            header = False
+            rows_kept += len(kept)
+            uncertain_rows += int(uncertain.sum())
+
+    return {
+        "rows_read": rows_read,
+        "rows_after_dropna": rows_after_dropna,
+        "rows_kept": rows_kept,
+        "uncertain_rows": uncertain_rows,
+        "uncertain_share": uncertain_rows / rows_after_dropna if rows_after_dropna else 0.0,
+        "rank_error": KLLSketch(k=sketch_k).rank_error(),
+        "fences": fences,
+    }
+
+def print_filter_report(report):
+    print(f"Rows read: {report['rows_read']}, without missing values: {report['rows_after_dropna']}, "
+          f"kept: {report['rows_kept']}")
+    print(f"Quantile rank error: ±{report['rank_error']:.2%} (99% confidence)")
+    print(f"At most {report['uncertain_rows']} rows ({report['uncertain_share']:.2%}) may differ from the exact filter")
+    for col, fence in report["fences"].items():
+        print(f"  {col}: Q1={fence.q1.value:.4g} [{fence.q1.low:.4g}, {fence.q1.high:.4g}] "
+              f"Q3={fence.q3.value:.4g} [{fence.q3.low:.4g}, {fence.q3.high:.4g}] "
+              f"keep {fence.lower:.4g}..{fence.upper:.4g}")
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+# Tables that hold submitted forms; all share the same layout
+SUBMISSION_TABLES = ("health_reports", "contact_messages")
+
+# Raised when the write queue stays full for longer than the caller is willing to wait
+class WriteQueueFull(Exception):
+    pass
+
+# SQLite store for form submissions
+#
+# WAL mode lets the query endpoints read while a batch is being committed, and
+# every batch is one transaction, so a commit (and its fsync) is shared by all
+# the submissions in it. Rows are indexed by (email, submitted_at) for lookups
+# and by submitted_at for listing everything newest first.
+# Nothing touches the database until open() is called.
+class SubmissionStore:
+    def __init__(self, path):
+        self.path = path
+        self._write_conn = None
+        self._read_conn = None
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+    # Create the database and tables if needed and open the connections
+    def open(self):
+        if self._write_conn is not None:
+            return
+        self._write_conn = self._connect()
+        self._read_conn = self._connect()
+        with self._write_lock:
+            for table in SUBMISSION_TABLES:
+                self._write_conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        submitted_at REAL NOT NULL,
+                        email TEXT NOT NULL,
+                        payload TEXT NOT NULL
+                    )""")
+                self._write_conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_email_time ON {table} (email, submitted_at)")
+                self._write_conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_time ON {table} (submitted_at)")
+            self._write_conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Commits are durable once they return; batching keeps the fsync count low
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # Insert rows [(table, submitted_at, email, payload dict)] in one transaction; returns their ids
+    def insert_many(self, rows):
+        ids = []
+        with self._write_lock:
+            cursor = self._write_conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                for table, submitted_at, email, payload in rows:
+                    _check_table(table)
+                    cursor.execute(f"INSERT INTO {table} (submitted_at, email, payload) VALUES (?, ?, ?)",
+                                   (submitted_at, email, json.dumps(payload)))
+                    ids.append(cursor.lastrowid)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return ids
+
+    # Newest-first page of submissions, optionally for one email
+    # cursor is the "submitted_at:id" of the last row of the previous page
+    def query(self, table, email=None, cursor=None, limit=50):
+        _check_table(table)
+        conditions = []
+        params = []
+        if email is not None:
+            conditions.append("email = ?")
+            params.append(email)
+        if cursor is not None:
+            submitted_at, row_id = parse_cursor(cursor)
+            conditions.append("(submitted_at < ? OR (submitted_at = ? AND id < ?))")
+            params.extend([submitted_at, submitted_at, row_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                f"SELECT id, submitted_at, email, payload FROM {table} {where} "
+                f"ORDER BY submitted_at DESC, id DESC LIMIT ?", (*params, limit + 1)).fetchall()
+
+        items = [{"id": row_id, "submitted_at": submitted_at, "email": email, **json.loads(payload)}
+                 for row_id, submitted_at, email, payload in rows[:limit]]
+        next_cursor = f"{items[-1]['submitted_at']!r}:{items[-1]['id']}" if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def close(self):
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+
+def parse_cursor(cursor):
+    try:
+        submitted_at, row_id = cursor.rsplit(":", 1)
+        return float(submitted_at), int(row_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+def _check_table(table):
+    if table not in SUBMISSION_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+
+# Write-behind queue that group-commits submissions
+#
+# write() enqueues a row and waits until the batch containing it has been
+# committed, so a successful response means the row is on disk. A single
+# writer task collects rows until max_batch are pending or max_delay seconds
+# have passed since the first one, then commits them on a thread. At most
+# max_pending rows are queued; beyond that write() waits up to enqueue_timeout
+# and then raises WriteQueueFull. close() commits everything still queued.
+class WriteBehindQueue:
+    def __init__(self, store, max_batch=256, max_delay=0.02, max_pending=10000, enqueue_timeout=1.0):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.get_running_loop().create_task(self._write_forever())
+
+    async def write(self, table, email, payload):
+        if self._task is None:
+            raise RuntimeError("Write queue is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put(((table, time.time(), email, payload), future)),
+                                   self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise WriteQueueFull("Too many submissions are waiting to be stored")
+        return await future
+
+    async def _write_forever(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+            if stop:
+                return
+
+    async def _commit(self, batch):
+        try:
+            ids = await asyncio.to_thread(self.store.insert_many, [row for row, _ in batch])
+        except Exception as e:
+            logging.error(f"Committing {len(batch)} submissions failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), row_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(row_id)
+
+    # Commit everything already queued, then stop the writer
+    async def close(self):
+        if self._task is None:
+            return
+        # Rows queued before the sentinel are committed first
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_rows": self.rows / self.batches if self.batches else 0.0,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+
+from utils.lru_cache import LRUCache
+
+# Latitude limit of the Web Mercator projection used by slippy map tiles
+MAX_LATITUDE = 85.05112878
+MAX_ZOOM = 18
+
+# Range of tile x/y indices covering a bounding box at a zoom level (inclusive)
+def tiles_for_bbox(min_lon, min_lat, max_lon, max_lat, zoom):
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"Zoom must be between 0 and {MAX_ZOOM}")
+    if not all(math.isfinite(value) for value in (min_lon, min_lat, max_lon, max_lat)):
+        raise ValueError("Bounding box coordinates must be finite")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("Bounding box must be min_lon,min_lat,max_lon,max_lat")
+    x_min, y_max = lonlat_to_tile(min_lon, min_lat, zoom)
+    x_max, y_min = lonlat_to_tile(max_lon, max_lat, zoom)
+    return x_min, x_max, y_min, y_max
+
+def lonlat_to_tile(lon, lat, zoom):
+    n = 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+# Latitude and longitude of tile centres, vectorized over x and y
+def tile_centers(xs, ys, zoom):
+    n = 2 ** zoom
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    lons = (xs + 0.5) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (ys + 0.5) / n))))
+    return lats, lons
+
+# LRU of per-tile results keyed by (zoom, x, y, ...)
+class TileCache(LRUCache):
+    def __init__(self, max_tiles=100000):
+        super().__init__(max_tiles)
@@ -0,0 +1,87 @@
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+
+from sklearn.model_selection import GridSearchCV, KFold
+# Successive halving is still experimental in sklearn and must be enabled explicitly
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV
+
+from model_registry import BASE_VERSION, ModelRegistry
+
+SEARCH_METHODS = ("grid", "halving")
+
+# Records how long each training stage takes and prints a summary
+class StageTimer:
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.stages)
+        print("Training time per stage:")
+        for name, seconds in self.stages:
+            share = seconds / total if total > 0 else 0.0
+            print(f"  {name:<24s} {seconds:8.2f}s  {share:6.1%}")
+        print(f"  {'total':<24s} {total:8.2f}s")
+
+# Compute the CV folds once so every candidate (and every search) reuses the same splits
+def cached_cv_folds(X, n_splits, random_state=42):
+    return list(KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(X))
+
+# Build the hyperparameter search; refit=True keeps the best model trained on all training data
+def make_search(estimator, param_grid, folds, method="grid", n_jobs=-1, verbose=0, random_state=42):
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Search method must be one of {SEARCH_METHODS}, got '{method}'")
+
+    if method == "halving":
+        # Candidates are first scored on a small subsample; only the best get more data
+        return HalvingGridSearchCV(estimator, param_grid, cv=folds, scoring='neg_mean_squared_error',
+                                   n_jobs=n_jobs, refit=True, verbose=verbose, random_state=random_state)
+    return GridSearchCV(estimator, param_grid, cv=folds, scoring='neg_mean_squared_error',
+                        n_jobs=n_jobs, refit=True, verbose=verbose)
+
+# Trained models are published as new versions in the layout the server's ModelRegistry watches:
+# the files are written to models_dir/.<version>/ and the folder is renamed to models_dir/<version>/
+# once complete, so a running server hot-reloads it and never sees half-written files
+
+# Next "v<n>" version name, counting versions still being written
+def next_version(models_dir):
+    numbers = [0]
+    for entry in os.listdir(models_dir) if os.path.isdir(models_dir) else []:
+        match = re.fullmatch(r"\.?v(\d+)", entry)
+        if match:
+            numbers.append(int(match.group(1)))
+    return f"v{max(numbers) + 1}"
+
+# Directory of the newest complete version (the server serves this one), None if there is none
+def latest_version_path(models_dir, model_file, scaler_file):
+    versions = ModelRegistry("training", models_dir, model_file, scaler_file).available_versions()
+    if not versions:
+        return None
+    return models_dir if versions[-1] == BASE_VERSION else os.path.join(models_dir, versions[-1])
+
+# Yields the hidden directory to save the version's files in and publishes it on success
+@contextmanager
+def publish_version(models_dir, version):
+    path = os.path.join(models_dir, version)
+    if os.path.exists(path):
+        raise FileExistsError(f"Model version {version} already exists in {models_dir}")
+    tmp_path = os.path.join(models_dir, f".{version}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        yield tmp_path
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    os.rename(tmp_path, path)
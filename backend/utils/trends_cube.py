@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Pollutant name -> column suffix in the weather/air quality dataset
+POLLUTANT_COLUMNS = {
+    "PM2.5": "PM2.5_Particulate (ug/m3)",
+    "PM10": "PM10_Particulate (ug/m3)",
+    "NO2": "Nitrogen_Dioxide (ug/m3)",
+    "Ozone": "Ozone (ug/m3)",
+    "SO2": "Sulphur_Dioxide (ug/m3)",
+}
+
+# Site type -> column prefix
+SITE_PREFIXES = {
+    "roadside": "Roadside_",
+    "background": "Background_",
+}
+
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June",
+               "July", "August", "September", "October", "November", "December"]
+
+GRANULARITIES = ("month", "year")
+
+# Number of distinct query results kept per cube
+MAX_CACHED_QUERIES = 256
+
+# Pre-aggregated pollutant x site type x year x month cube of the trends data
+#
+# Sums and counts are accumulated once, with running totals along the year
+# axis, so any year range can be answered without touching the raw rows.
+# The cube is immutable; rebuilding it for new data also drops its cache.
+class TrendsCube:
+    def __init__(self, pollutants, sites, years, sums, counts):
+        self.pollutants = list(pollutants)
+        self.sites = list(sites)
+        self.years = list(years)
+        # Monthly totals, shape (pollutants, sites, years, 12); kept for to_arrays()
+        self.sums = sums
+        self.counts = counts
+        # Shapes are (pollutants, sites, years + 1, 12), cumulative over years
+        self.cumulative_sums = np.concatenate([np.zeros_like(sums[:, :, :1]), np.cumsum(sums, axis=2)], axis=2)
+        self.cumulative_counts = np.concatenate([np.zeros_like(counts[:, :, :1]), np.cumsum(counts, axis=2)], axis=2)
+        # Per-year totals, shape (pollutants, sites, years)
+        self.year_sums = sums.sum(axis=3)
+        self.year_counts = counts.sum(axis=3)
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    # Aggregate a DataFrame with a 'YYYY-MM' date column
+    # The DataFrame is read, never modified
+    @classmethod
+    def from_frame(cls, data, date_column="date"):
+        import pandas as pd
+
+        dates = pd.to_datetime(data[date_column], format="%Y-%m")
+        columns = {prefix + suffix: data[prefix + suffix].to_numpy(dtype=np.float64)
+                   for prefix in SITE_PREFIXES.values() for suffix in POLLUTANT_COLUMNS.values()
+                   if prefix + suffix in data.columns}
+        return cls.from_arrays(dates.dt.year.to_numpy(), dates.dt.month.to_numpy(), columns)
+
+    # Aggregate straight from the columns of a ColumnStore
+    @classmethod
+    def from_store(cls, store):
+        columns = {prefix + suffix: store.column(prefix + suffix)
+                   for prefix in SITE_PREFIXES.values() for suffix in POLLUTANT_COLUMNS.values()
+                   if prefix + suffix in store}
+        return cls.from_arrays(store.years(), store.months(), columns)
+
+    # Aggregate from year and month arrays plus a mapping of column name -> values
+    @classmethod
+    def from_arrays(cls, year_values, month_values, columns):
+        years = list(range(int(year_values.min()), int(year_values.max()) + 1)) if len(year_values) else []
+        year_index = np.asarray(year_values, dtype=np.int64) - (years[0] if years else 0)
+        month_index = np.asarray(month_values, dtype=np.int64) - 1
+
+        pollutants = [name for name, suffix in POLLUTANT_COLUMNS.items()
+                      if any(prefix + suffix in columns for prefix in SITE_PREFIXES.values())]
+        sites = list(SITE_PREFIXES)
+
+        sums = np.zeros((len(pollutants), len(sites), len(years), 12))
+        counts = np.zeros((len(pollutants), len(sites), len(years), 12))
+        for p, pollutant in enumerate(pollutants):
+            for s, site in enumerate(sites):
+                column = SITE_PREFIXES[site] + POLLUTANT_COLUMNS[pollutant]
+                if column not in columns:
+                    continue
+                values = np.asarray(columns[column], dtype=np.float64)
+                present = ~np.isnan(values)
+                np.add.at(sums[p, s], (year_index[present], month_index[present]), values[present])
+                np.add.at(counts[p, s], (year_index[present], month_index[present]), 1)
+
+        return cls(pollutants, sites, years, sums, counts)
+
+    # Monthly totals and labels, for saving the cube (e.g. to an ArtifactCache)
+    def to_arrays(self):
+        return ({"sums": self.sums, "counts": self.counts},
+                {"pollutants": self.pollutants, "sites": self.sites, "years": [int(year) for year in self.years]})
+
+    @classmethod
+    def from_saved(cls, arrays, metadata):
+        return cls(metadata["pollutants"], metadata["sites"], metadata["years"], arrays["sums"], arrays["counts"])
+
+    # Answer a trends query, reusing the cached result when the same query was seen before
+    def query(self, pollutants=("PM2.5", "NO2", "Ozone"), site="roadside",
+              start_year=None, end_year=None, granularity="month"):
+        key = (tuple(pollutants), site, start_year, end_year, granularity)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = self._compute(list(pollutants), site, start_year, end_year, granularity)
+
+        with self._cache_lock:
+            self._cache[key] = result
+            if len(self._cache) > MAX_CACHED_QUERIES:
+                self._cache.popitem(last=False)
+        return result
+
+    def _compute(self, pollutants, site, start_year, end_year, granularity):
+        unknown = [pollutant for pollutant in pollutants if pollutant not in self.pollutants]
+        if unknown:
+            raise ValueError(f"Unknown pollutants {unknown}; available: {self.pollutants}")
+        if site not in self.sites:
+            raise ValueError(f"Unknown site type '{site}'; available: {self.sites}")
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}'; available: {list(GRANULARITIES)}")
+
+        # Clip the requested year range to the years in the cube
+        first, last = 0, len(self.years)
+        if self.years and start_year is not None:
+            first = min(max(start_year - self.years[0], 0), len(self.years))
+        if self.years and end_year is not None:
+            last = max(min(end_year - self.years[0] + 1, len(self.years)), 0)
+        last = max(last, first)
+
+        s = self.sites.index(site)
+        rows = [self.pollutants.index(pollutant) for pollutant in pollutants]
+
+        if granularity == "month":
+            # Average of each calendar month across the selected years
+            sums = self.cumulative_sums[rows, s, last] - self.cumulative_sums[rows, s, first]
+            counts = self.cumulative_counts[rows, s, last] - self.cumulative_counts[rows, s, first]
+            result = {"months": np.array(MONTH_NAMES)}
+        else:
+            # Average of each selected year across its months
+            sums = self.year_sums[rows, s, first:last]
+            counts = self.year_counts[rows, s, first:last]
+            result = {"years": np.array(self.years[first:last], dtype=np.int64)}
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        # Months or years without readings stay NaN (null in JSON)
+        for pollutant, values in zip(pollutants, means):
+            result[pollutant] = values
+        # Results are cached and shared between requests, so their arrays are made read-only
+        for values in result.values():
+            values.flags.writeable = False
+        return result
@@ -170,20 +170,31 @@ function App() {
 
   // FETCH TEMP & AQI
   useEffect(() => {
+    const showPrediction = ({ predicted_temperature, predicted_aqi }) => {
+      setWeatherData({
+        temperature: predicted_temperature,
+        aqi: predicted_aqi
+      });
+    };
+
     const fetchWeatherData = async () => {
       try {
         const response = await axios.post('http://127.0.0.1:8000/api/predict_aqi_temperature', {});
-        const { predicted_temperature, predicted_aqi } = response.data;
-
-        setWeatherData({
-          temperature: predicted_temperature,
-          aqi: predicted_aqi
-        });
+        showPrediction(response.data);
       } catch (error) {
         console.error('Error fetching weather data:', error);
       }
     };
 
+    // The server pushes every new prediction; EventSource reconnects by itself
+    if (window.EventSource) {
+      const source = new EventSource('http://127.0.0.1:8000/api/stream/aqi_temperature');
+      source.addEventListener('aqi_temperature', (event) => showPrediction(JSON.parse(event.data)));
+      source.onerror = (error) => console.error('Prediction stream error:', error);
+      return () => source.close();
+    }
+
+    // Browsers without server-sent events poll instead
     fetchWeatherData();
 
     // Optionally set up polling as needed